@@ -1,122 +1,1829 @@
+import argparse
+import contextlib
 import cv2
+import glob
+import hashlib
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 from ultralytics import YOLO
-from collections import defaultdict
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # Hungarian assignment is optional
+    linear_sum_assignment = None
+
+
+def iou_batch(boxes_a, boxes_b):
+    """
+    Calculate the IoU matrix between two sets of boxes [x1, y1, x2, y2]
+
+    Args:
+        boxes_a: Array of shape (N, 4)
+        boxes_b: Array of shape (M, 4)
+
+    Returns:
+        Array of shape (N, M) with the IoU of every pair
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)[:, None, :]
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)[None, :, :]
+
+    iw = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    ih = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = iw * ih
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - intersection
+
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def greedy_assignment(iou_matrix, iou_threshold):
+    """
+    Match rows to columns greedily, highest IoU first
+
+    Returns:
+        Array of shape (K, 2) with matched (row, col) index pairs
+    """
+    rows, cols = np.nonzero(iou_matrix >= iou_threshold)
+    if len(rows) == 0:
+        return np.empty((0, 2), dtype=np.intp)
+
+    # Only pairs that pass the gate are candidates, so this loop stays short
+    order = np.argsort(-iou_matrix[rows, cols], kind='stable')
+    used_rows = np.zeros(iou_matrix.shape[0], dtype=bool)
+    used_cols = np.zeros(iou_matrix.shape[1], dtype=bool)
+    matches = []
+    for i in order:
+        r, c = rows[i], cols[i]
+        if not used_rows[r] and not used_cols[c]:
+            used_rows[r] = used_cols[c] = True
+            matches.append((r, c))
+
+    return np.array(matches, dtype=np.intp).reshape(-1, 2)
+
+
+def hungarian_assignment(iou_matrix, iou_threshold):
+    """
+    Match rows to columns by maximising total IoU (linear sum assignment)
+
+    Returns:
+        Array of shape (K, 2) with matched (row, col) index pairs
+    """
+    if linear_sum_assignment is None:
+        raise ImportError("Hungarian assignment requires scipy (pip install scipy)")
+
+    rows, cols = linear_sum_assignment(-iou_matrix)
+    keep = iou_matrix[rows, cols] >= iou_threshold
+    return np.stack([rows[keep], cols[keep]], axis=1).astype(np.intp)
+
+
+ASSIGNMENT_METHODS = {
+    'greedy': greedy_assignment,
+    'hungarian': hungarian_assignment,
+}
+
+
+def xyxy_to_cxcywh(boxes):
+    """Convert [x1, y1, x2, y2] boxes to [cx, cy, w, h]"""
+    boxes = np.asarray(boxes, dtype=np.float64)
+    wh = boxes[:, 2:4] - boxes[:, 0:2]
+    return np.hstack([boxes[:, 0:2] + wh / 2, wh])
+
+
+def cxcywh_to_xyxy(boxes):
+    """Convert [cx, cy, w, h] boxes to [x1, y1, x2, y2]"""
+    half = np.clip(boxes[:, 2:4], 1, None) / 2
+    return np.hstack([boxes[:, 0:2] - half, boxes[:, 0:2] + half])
+
+
+class KalmanBoxFilter:
+    """
+    Batched constant-velocity Kalman filter for bounding boxes
+
+    The state of every track is [cx, cy, w, h, vx, vy, vw, vh]. Means and
+    covariances for all tracks are stacked into (N, 8) and (N, 8, 8) arrays
+    so predict and update run as a handful of NumPy calls per frame.
+    Process and measurement noise scale with the box size.
+    """
+    def __init__(self, std_weight_position=1 / 20, std_weight_velocity=1 / 160):
+        self.std_weight_position = std_weight_position
+        self.std_weight_velocity = std_weight_velocity
+        self.motion = np.eye(8)
+        self.motion[:4, 4:] = np.eye(4)
+
+    def _box_scale(self, mean):
+        """Per-dimension scale [w, h, w, h] used for the noise terms"""
+        wh = np.clip(mean[:, 2:4], 1, None)
+        return np.hstack([wh, wh])
+
+    def initiate(self, boxes):
+        """
+        Create track state from unassociated [x1, y1, x2, y2] boxes
+
+        Returns:
+            mean (N, 8) and covariance (N, 8, 8)
+        """
+        measurement = xyxy_to_cxcywh(boxes)
+        mean = np.hstack([measurement, np.zeros_like(measurement)])
+        scale = self._box_scale(mean)
+        std = np.hstack([2 * self.std_weight_position * scale,
+                         10 * self.std_weight_velocity * scale])
+        covariance = np.zeros((len(mean), 8, 8))
+        covariance[:, np.arange(8), np.arange(8)] = std ** 2
+        return mean, covariance
+
+    def predict(self, mean, covariance):
+        """Advance all tracks by one frame"""
+        scale = self._box_scale(mean)
+        std = np.hstack([self.std_weight_position * scale,
+                         self.std_weight_velocity * scale])
+        mean = mean @ self.motion.T
+        covariance = self.motion @ covariance @ self.motion.T
+        covariance[:, np.arange(8), np.arange(8)] += std ** 2
+        return mean, covariance
+
+    def update(self, mean, covariance, boxes):
+        """Correct the predicted state with matched [x1, y1, x2, y2] boxes"""
+        measurement = xyxy_to_cxcywh(boxes)
+        std = self.std_weight_position * self._box_scale(mean)[:, :4]
+
+        innovation_cov = covariance[:, :4, :4].copy()
+        innovation_cov[:, np.arange(4), np.arange(4)] += std ** 2
+        # Innovation covariance is symmetric, so solve for the gain transposed
+        gain = np.linalg.solve(innovation_cov, covariance[:, :4, :]).transpose(0, 2, 1)
+        innovation = measurement - mean[:, :4]
+
+        mean = mean + (gain @ innovation[:, :, None])[:, :, 0]
+        covariance = covariance - gain @ innovation_cov @ gain.transpose(0, 2, 1)
+        return mean, covariance
+
+
+def nms(detections, iou_threshold=0.5):
+    """
+    Class-aware non-maximum suppression
+
+    Args:
+        detections: (N, 6) array of [x1, y1, x2, y2, confidence, class_id]
+        iou_threshold: Boxes of the same class overlapping more than this
+            with a higher-confidence box are removed
+
+    Returns:
+        The kept detections, highest confidence first
+    """
+    if len(detections) < 2:
+        return detections
+    detections = detections[np.argsort(-detections[:, 4], kind='stable')]
+    # Shift each class to its own region so boxes of different classes never overlap
+    offset = detections[:, 5:6] * (detections[:, :4].max() + 1)
+    overlaps = iou_batch(detections[:, :4] + offset, detections[:, :4] + offset)
+    suppressed = np.zeros(len(detections), dtype=bool)
+    for i in range(len(detections)):
+        if not suppressed[i]:
+            suppressed[i + 1:] |= overlaps[i, i + 1:] > iou_threshold
+    return detections[~suppressed]
+
+
+def split_tiles(region, rows, cols, overlap=0.2):
+    """Split an [x1, y1, x2, y2] region into a rows x cols grid of overlapping tiles"""
+    x1, y1, x2, y2 = region
+    tile_w = (x2 - x1) / (cols - (cols - 1) * overlap)
+    tile_h = (y2 - y1) / (rows - (rows - 1) * overlap)
+    tiles = []
+    for r in range(rows):
+        for c in range(cols):
+            tx = x1 + c * tile_w * (1 - overlap)
+            ty = y1 + r * tile_h * (1 - overlap)
+            tiles.append((int(tx), int(ty), int(min(x2, round(tx + tile_w))),
+                          int(min(y2, round(ty + tile_h)))))
+    return tiles
+
+
+def merge_regions(regions):
+    """Merge overlapping [x1, y1, x2, y2] regions into their bounding boxes"""
+    regions = [list(region) for region in regions]
+    merged = True
+    while merged:
+        merged = False
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    regions[i] = [min(a[0], b[0]), min(a[1], b[1]),
+                                  max(a[2], b[2]), max(a[3], b[3])]
+                    del regions[j]
+                    merged = True
+                    break
+            if merged:
+                break
+    return [tuple(region) for region in regions]
+
+
+def clip_regions(regions, width, height):
+    """Clip [x1, y1, x2, y2] regions to the frame and drop the ones left empty"""
+    clipped = []
+    for x1, y1, x2, y2 in regions:
+        x1, x2 = max(0, min(x1, width)), max(0, min(x2, width))
+        y1, y2 = max(0, min(y1, height)), max(0, min(y2, height))
+        if x2 > x1 and y2 > y1:
+            clipped.append((x1, y1, x2, y2))
+    return clipped
+
+
+class TrackTable:
+    """
+    Struct-of-arrays storage for tracker state
+
+    Every column is a preallocated NumPy array indexed by slot. Dead slots
+    go onto a free-list and are reused by new tracks, so steady-state
+    tracking does not allocate per track.
+    """
+    def __init__(self, capacity=64):
+        self.capacity = 0
+        self.bbox = np.zeros((0, 4), dtype=np.float32)
+        self.age = np.zeros(0, dtype=np.int32)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.total_hits = np.zeros(0, dtype=np.int32)
+        self.class_id = np.zeros(0, dtype=np.int32)
+        self.confidence = np.zeros(0, dtype=np.float32)
+        self.id = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+        self.mean = np.zeros((0, 8), dtype=np.float64)
+        self.covariance = np.zeros((0, 8, 8), dtype=np.float64)
+        self.free_slots = []
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        """Enlarge every column to the given capacity"""
+        extra = capacity - self.capacity
+        for name in ('bbox', 'age', 'hits', 'total_hits', 'class_id',
+                     'confidence', 'id', 'alive', 'mean', 'covariance'):
+            column = getattr(self, name)
+            padding = np.zeros((extra,) + column.shape[1:], dtype=column.dtype)
+            setattr(self, name, np.concatenate([column, padding]))
+        # Hand out low slots first so live tracks stay packed together
+        self.free_slots = list(range(capacity - 1, self.capacity - 1, -1)) + self.free_slots
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.capacity - len(self.free_slots)
+
+    def live_slots(self):
+        """Indices of the slots currently holding a track"""
+        return np.flatnonzero(self.alive)
+
+    def allocate(self, count):
+        """Reserve `count` free slots and mark them alive"""
+        if count > len(self.free_slots):
+            self._grow(max(self.capacity * 2, len(self) + count))
+        slots = np.array([self.free_slots.pop() for _ in range(count)], dtype=np.intp)
+        self.alive[slots] = True
+        return slots
+
+    def release(self, slots):
+        """Return slots to the free-list"""
+        self.alive[slots] = False
+        self.free_slots.extend(int(s) for s in slots)
+
+    def view(self, slots):
+        """Read-only snapshot of the given slots"""
+        return TrackView(self, slots)
+
+
+class TrackView:
+    """
+    Read-only arrays describing a subset of tracks from a TrackTable
+
+    `detections` holds the thresholded detections the tracks were updated
+    with on this frame, or None when the detector did not run.
+    """
+    __slots__ = ('slots', 'ids', 'bboxes', 'class_ids', 'confidences', 'detections')
+
+    def __init__(self, table, slots):
+        self.detections = None
+        self.slots = slots
+        self.ids = table.id[slots]
+        self.bboxes = table.bbox[slots]
+        self.class_ids = table.class_id[slots]
+        self.confidences = table.confidence[slots]
+        for column in (self.slots, self.ids, self.bboxes, self.class_ids, self.confidences):
+            column.setflags(write=False)
+
+    def __len__(self):
+        return len(self.ids)
+
 
 class SimpleSORT:
     """Simplified SORT tracker for object tracking"""
-    def __init__(self, max_age=30, min_hits=3, iou_threshold=0.3):
+    def __init__(self, max_age=30, min_hits=3, iou_threshold=0.3, assignment='greedy',
+                 motion_model='kalman'):
+        """
+        Args:
+            max_age: Frames a track survives without a matching detection
+            min_hits: Matches needed before a track is reported
+            iou_threshold: Minimum IoU for a detection to match a track
+            assignment: Matching strategy ('greedy' or 'hungarian')
+            motion_model: 'kalman' to match against predicted boxes, or None
+                to match against the last observed boxes
+        """
+        if assignment not in ASSIGNMENT_METHODS:
+            raise ValueError(f"Unknown assignment method: {assignment} "
+                             f"(choose from {', '.join(ASSIGNMENT_METHODS)})")
+        if motion_model not in ('kalman', None):
+            raise ValueError(f"Unknown motion model: {motion_model}")
         self.max_age = max_age
         self.min_hits = min_hits
         self.iou_threshold = iou_threshold
-        self.tracks = []
+        self.assignment = assignment
+        self.kalman = KalmanBoxFilter() if motion_model == 'kalman' else None
+        self.tracks = TrackTable()
         self.track_id_counter = 0
         
     def iou(self, box1, box2):
         """Calculate IoU between two boxes [x1, y1, x2, y2]"""
-        x1 = max(box1[0], box2[0])
-        y1 = max(box1[1], box2[1])
-        x2 = min(box1[2], box2[2])
-        y2 = min(box1[3], box2[3])
-        
-        intersection = max(0, x2 - x1) * max(0, y2 - y1)
-        area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
-        area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
-        union = area1 + area2 - intersection
-        
-        return intersection / union if union > 0 else 0
+        return float(iou_batch(box1, box2)[0, 0])
+    
+    def _predict(self, slots):
+        """Move the boxes of the given slots to their predicted positions"""
+        if self.kalman is None or len(slots) == 0:
+            return
+        tracks = self.tracks
+        tracks.mean[slots], tracks.covariance[slots] = self.kalman.predict(
+            tracks.mean[slots], tracks.covariance[slots])
+        tracks.bbox[slots] = cxcywh_to_xyxy(tracks.mean[slots, :4])
+    
+    def _confirmed(self):
+        """TrackView of the live tracks with enough hits"""
+        live = self.tracks.live_slots()
+        return self.tracks.view(live[self.tracks.total_hits[live] >= self.min_hits])
+    
+    def predict(self):
+        """
+        Coast all tracks one frame forward without detections
+
+        Used on frames where the detector is skipped. Tracks are not aged,
+        so skipped frames do not count towards max_age.
+
+        Returns:
+            TrackView of the confirmed tracks
+        """
+        self._predict(self.tracks.live_slots())
+        return self._confirmed()
+    
+    def shift(self, slots, offsets):
+        """
+        Translate tracks by per-track (dx, dy) offsets without detections
+
+        Used to propagate tracks with optical flow on skipped frames.
+
+        Returns:
+            TrackView of the confirmed tracks
+        """
+        tracks = self.tracks
+        tracks.bbox[slots] += np.tile(offsets, 2).astype(np.float32)
+        if self.kalman is not None:
+            tracks.mean[slots, :2] += offsets
+        return self._confirmed()
     
     def update(self, detections):
         """
         Update tracks with new detections
-        detections: list of [x1, y1, x2, y2, confidence, class_id]
+        detections: list or (N, 6) array of [x1, y1, x2, y2, confidence, class_id]
+
+        Returns:
+            TrackView of the confirmed tracks
         """
+        tracks = self.tracks
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+        
         # Update existing tracks
-        for track in self.tracks:
-            track['age'] += 1
-            track['hits'] = 0
+        live = tracks.live_slots()
+        tracks.age[live] += 1
+        tracks.hits[live] = 0
+        self._predict(live)
         
         # Match detections to tracks
-        if len(detections) > 0 and len(self.tracks) > 0:
-            iou_matrix = np.zeros((len(detections), len(self.tracks)))
-            for d, det in enumerate(detections):
-                for t, track in enumerate(self.tracks):
-                    iou_matrix[d, t] = self.iou(det[:4], track['bbox'])
-            
-            # Simple greedy matching
-            matched_indices = set()
-            for _ in range(min(len(detections), len(self.tracks))):
-                max_iou = np.max(iou_matrix)
-                if max_iou < self.iou_threshold:
-                    break
-                    
-                d, t = np.unravel_index(np.argmax(iou_matrix), iou_matrix.shape)
-                self.tracks[t]['bbox'] = detections[d][:4]
-                self.tracks[t]['class_id'] = int(detections[d][5])
-                self.tracks[t]['confidence'] = detections[d][4]
-                self.tracks[t]['age'] = 0
-                self.tracks[t]['hits'] += 1
-                self.tracks[t]['total_hits'] += 1
-                matched_indices.add(d)
-                iou_matrix[d, :] = -1
-                iou_matrix[:, t] = -1
+        matched = np.zeros(len(detections), dtype=bool)
+        if len(detections) > 0 and len(live) > 0:
+            iou_matrix = iou_batch(detections[:, :4], tracks.bbox[live])
+            matches = ASSIGNMENT_METHODS[self.assignment](iou_matrix, self.iou_threshold)
             
-            # Create new tracks for unmatched detections
-            for d, det in enumerate(detections):
-                if d not in matched_indices:
-                    self.tracks.append({
-                        'id': self.track_id_counter,
-                        'bbox': det[:4],
-                        'class_id': int(det[5]),
-                        'confidence': det[4],
-                        'age': 0,
-                        'hits': 1,
-                        'total_hits': 1
-                    })
-                    self.track_id_counter += 1
-        elif len(detections) > 0:
-            # No existing tracks, create new ones
-            for det in detections:
-                self.tracks.append({
-                    'id': self.track_id_counter,
-                    'bbox': det[:4],
-                    'class_id': int(det[5]),
-                    'confidence': det[4],
-                    'age': 0,
-                    'hits': 1,
-                    'total_hits': 1
-                })
-                self.track_id_counter += 1
+            d, slots = matches[:, 0], live[matches[:, 1]]
+            if self.kalman is not None:
+                tracks.mean[slots], tracks.covariance[slots] = self.kalman.update(
+                    tracks.mean[slots], tracks.covariance[slots], detections[d, :4])
+                tracks.bbox[slots] = cxcywh_to_xyxy(tracks.mean[slots, :4])
+            else:
+                tracks.bbox[slots] = detections[d, :4]
+            tracks.class_id[slots] = detections[d, 5]
+            tracks.confidence[slots] = detections[d, 4]
+            tracks.age[slots] = 0
+            tracks.hits[slots] += 1
+            tracks.total_hits[slots] += 1
+            matched[d] = True
+        
+        # Create new tracks for unmatched detections
+        new = detections[~matched]
+        if len(new) > 0:
+            slots = tracks.allocate(len(new))
+            tracks.bbox[slots] = new[:, :4]
+            if self.kalman is not None:
+                tracks.mean[slots], tracks.covariance[slots] = self.kalman.initiate(new[:, :4])
+            tracks.class_id[slots] = new[:, 5]
+            tracks.confidence[slots] = new[:, 4]
+            tracks.age[slots] = 0
+            tracks.hits[slots] = 1
+            tracks.total_hits[slots] = 1
+            tracks.id[slots] = np.arange(self.track_id_counter, self.track_id_counter + len(new))
+            self.track_id_counter += len(new)
         
         # Remove old tracks
-        self.tracks = [t for t in self.tracks if t['age'] < self.max_age]
+        live = tracks.live_slots()
+        tracks.release(live[tracks.age[live] >= self.max_age])
         
         # Return confirmed tracks
-        return [t for t in self.tracks if t['total_hits'] >= self.min_hits]
+        return self._confirmed()
+
+
+class _StageTimer:
+    """Context manager that records its duration into a StageProfiler"""
+    __slots__ = ('profiler', 'name', 'start')
+    
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+# Shared no-op context returned while profiling is disabled
+_NO_TIMING = contextlib.nullcontext()
+
+
+class StageProfiler:
+    """
+    Rolling per-stage latency and FPS statistics
+
+    Stages are timed with `with profiler.stage('name'):`. While disabled,
+    stage() returns a shared no-op context and nothing is recorded.
+    Percentiles cover the last `window` samples of each stage; counts and
+    sums cover the whole run.
+    """
+    STAGES = ('decode', 'preprocess', 'inference', 'postprocess', 'transfer',
+              'track', 'draw', 'encode', 'display')
+    
+    def __init__(self, enabled=False, window=300):
+        self.enabled = enabled
+        self.window = window
+        self.samples = {}
+        self.totals = {}
+        self.frame_times = deque(maxlen=window)
+    
+    def stage(self, name):
+        """Context manager timing one stage"""
+        if not self.enabled:
+            return _NO_TIMING
+        return _StageTimer(self, name)
+    
+    def record(self, name, seconds):
+        """Add one duration sample for a stage"""
+        if not self.enabled:
+            return
+        if name not in self.samples:
+            self.samples[name] = deque(maxlen=self.window)
+            self.totals[name] = [0, 0.0]
+        self.samples[name].append(seconds)
+        totals = self.totals[name]
+        totals[0] += 1
+        totals[1] += seconds
+    
+    def frame_done(self):
+        """Mark the end of a frame for FPS"""
+        if self.enabled:
+            self.frame_times.append(time.perf_counter())
+    
+    def fps(self):
+        """Frames per second over the rolling window"""
+        if len(self.frame_times) < 2:
+            return 0.0
+        elapsed = self.frame_times[-1] - self.frame_times[0]
+        return (len(self.frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+    
+    def summary(self):
+        """Per-stage count, mean and p50/p95/p99 latency in milliseconds, plus FPS"""
+        stages = {}
+        order = [name for name in self.STAGES if name in self.samples]
+        order += sorted(name for name in self.samples if name not in self.STAGES)
+        for name in order:
+            window = np.array(self.samples[name]) * 1000
+            count, total = self.totals[name]
+            p50, p95, p99 = np.percentile(window, [50, 95, 99])
+            stages[name] = {'count': count, 'mean_ms': total * 1000 / count,
+                            'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+        return {'fps': self.fps(), 'stages': stages}
+    
+    def to_json(self):
+        """Summary as a JSON string"""
+        return json.dumps(self.summary(), indent=2)
+    
+    def to_prometheus(self, prefix='object_tracker'):
+        """Summary in the Prometheus text exposition format"""
+        summary = self.summary()
+        metric = f"{prefix}_stage_latency_seconds"
+        lines = [f"# HELP {metric} Per-stage processing latency",
+                 f"# TYPE {metric} summary"]
+        for name, stats in summary['stages'].items():
+            for quantile, key in (('0.5', 'p50_ms'), ('0.95', 'p95_ms'), ('0.99', 'p99_ms')):
+                lines.append(f'{metric}{{stage="{name}",quantile="{quantile}"}} '
+                             f'{stats[key] / 1000:.6f}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {self.totals[name][1]:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {stats["count"]}')
+        lines += [f"# HELP {prefix}_fps Frames per second over the rolling window",
+                  f"# TYPE {prefix}_fps gauge",
+                  f"{prefix}_fps {summary['fps']:.3f}"]
+        return "\n".join(lines) + "\n"
+    
+    def print_summary(self):
+        """Print a latency table"""
+        summary = self.summary()
+        print(f"Stage timings (ms, last {self.window} samples) - {summary['fps']:.1f} fps")
+        print(f"  {'stage':<12} {'p50':>8} {'p95':>8} {'p99':>8} {'mean':>8}")
+        for name, stats in summary['stages'].items():
+            print(f"  {name:<12} {stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} "
+                  f"{stats['p99_ms']:8.2f} {stats['mean_ms']:8.2f}")
+    
+    def save(self, path):
+        """Write the summary as Prometheus text (.prom/.txt) or JSON"""
+        with open(path, 'w') as f:
+            if path.endswith(('.prom', '.txt')):
+                f.write(self.to_prometheus())
+            else:
+                f.write(self.to_json())
+        print(f"✓ Profile saved to: {os.path.abspath(path)}")
+
+
+def put_with_policy(target, item, stopped, drop_oldest=False):
+    """
+    Put an item on a bounded queue
+
+    Blocks while the queue is full, or discards the oldest queued item when
+    drop_oldest is set. Gives up once the stopped event is set.
+
+    Returns:
+        True if the item was queued
+    """
+    while not stopped.is_set():
+        try:
+            target.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            if drop_oldest:
+                try:
+                    target.get_nowait()
+                except queue.Empty:
+                    pass
+    return False
+
+
+class FrameReader:
+    """Background thread that decodes frames from a VideoCapture into a bounded queue"""
+    def __init__(self, cap, queue_size=16, drop_oldest=False, profiler=None):
+        self.cap = cap
+        self.drop_oldest = drop_oldest
+        self.profiler = profiler or StageProfiler()
+        self.finished = False
+        self.frames = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        while not self.stopped.is_set():
+            with self.profiler.stage('decode'):
+                ret, frame = self.cap.read()
+            if not ret:
+                break
+            put_with_policy(self.frames, (frame, time.perf_counter()), self.stopped,
+                            self.drop_oldest)
+        # None marks the end of the stream
+        put_with_policy(self.frames, None, self.stopped)
+    
+    def read_batch(self, max_size, max_wait):
+        """
+        Collect up to max_size frames
+
+        Blocks for the first frame, then waits at most max_wait seconds for
+        the rest of the batch. Returns an empty list at the end of the stream.
+        """
+        batch = []
+        deadline = None
+        while len(batch) < max_size:
+            timeout = 0.1 if deadline is None else max(0.0, deadline - time.perf_counter())
+            try:
+                item = self.frames.get(timeout=timeout)
+            except queue.Empty:
+                if deadline is None and not self.stopped.is_set():
+                    continue
+                break
+            if item is None:
+                # Leave the marker for the next call
+                self.frames.put(None)
+                break
+            batch.append(item[0])
+            if deadline is None:
+                deadline = time.perf_counter() + max_wait
+        return batch
+    
+    def poll(self):
+        """
+        Take the next decoded frame without waiting
+
+        Returns:
+            (frame, capture_time) or None if no frame is ready. Sets
+            self.finished once the end of the stream has been reached.
+        """
+        try:
+            item = self.frames.get_nowait()
+        except queue.Empty:
+            return None
+        if item is None:
+            self.finished = True
+        return item
+    
+    def stop(self):
+        """Stop decoding and wait for the thread to exit"""
+        self.stopped.set()
+        while self.thread.is_alive():
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                pass
+            self.thread.join(timeout=0.05)
+
+
+class TrackingPipeline:
+    """
+    Decode, inference and annotate+encode stages running on separate threads
+
+    Stages are connected by bounded queues and each stage is a single
+    thread, so frames come out in capture order. With drop_oldest (meant
+    for live sources) stale frames are discarded instead of blocking the
+    decoder and the display.
+    """
+    def __init__(self, tracker, cap, render, queue_depth=8, drop_oldest=False,
+                 batch_size=1, max_wait=0.05):
+        """
+        Args:
+            tracker: ObjectDetectionTracker running the inference stage
+            cap: Opened cv2.VideoCapture
+            render: Callable (frame, tracks) -> annotated frame, run on the
+                annotate+encode thread
+            queue_depth: Capacity of each inter-stage queue
+            drop_oldest: Drop the oldest queued frame when a queue is full
+            batch_size: Frames per model call in the inference stage
+            max_wait: Longest time in seconds to wait for a batch to fill
+        """
+        self.tracker = tracker
+        self.render = render
+        self.drop_oldest = drop_oldest
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        self.stopped = threading.Event()
+        self.error = None
+        
+        self.reader = FrameReader(cap, queue_depth, drop_oldest, tracker.profiler)
+        self.tracked = queue.Queue(maxsize=queue_depth)
+        self.rendered = queue.Queue(maxsize=queue_depth)
+        self.threads = [
+            threading.Thread(target=self._infer, daemon=True),
+            threading.Thread(target=self._annotate, daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+    
+    def _infer(self):
+        try:
+            while not self.stopped.is_set():
+                batch = self.reader.read_batch(self.batch_size, self.max_wait)
+                if not batch:
+                    break
+                if self.batch_size > 1:
+                    tracks = self.tracker.track_batch(batch)
+                else:
+                    tracks = [self.tracker.track(batch[0])]
+                for item in zip(batch, tracks):
+                    # Every tracked frame reaches the encoder, in order
+                    put_with_policy(self.tracked, item, self.stopped)
+        except Exception as e:
+            self.error = e
+        finally:
+            put_with_policy(self.tracked, None, self.stopped)
+    
+    def _annotate(self):
+        try:
+            while not self.stopped.is_set():
+                item = self.tracked.get()
+                if item is None:
+                    break
+                annotated_frame = self.render(*item)
+                put_with_policy(self.rendered, annotated_frame, self.stopped, self.drop_oldest)
+        except Exception as e:
+            self.error = e
+        finally:
+            put_with_policy(self.rendered, None, self.stopped)
+    
+    def outputs(self):
+        """Yield annotated frames in order until the stream ends"""
+        while True:
+            annotated_frame = self.rendered.get()
+            if annotated_frame is None:
+                break
+            yield annotated_frame
+        if self.error is not None:
+            raise self.error
+    
+    def stop(self):
+        """Stop all stages and wait for their threads to exit"""
+        self.stopped.set()
+        self.reader.stop()
+        for thread in self.threads:
+            while thread.is_alive():
+                # Unblock stages waiting on a full or empty queue
+                for pending in (self.tracked, self.rendered):
+                    try:
+                        pending.get_nowait()
+                    except queue.Empty:
+                        pass
+                if not self.tracked.full():
+                    self.tracked.put_nowait(None)
+                thread.join(timeout=0.05)
+
+
+class MotionGate:
+    """
+    Cheap motion detector that decides whether a frame needs the detector
+
+    Frames are converted to small blurred grayscale images and compared
+    with the previous one (method='diff') or fed to a MOG2 background
+    subtractor (method='mog2'). A frame counts as moving when more than
+    `sensitivity` of its pixels changed. After max_static_frames static
+    frames in a row, the next frame is reported as moving so detections are
+    refreshed now and then.
+    """
+    def __init__(self, sensitivity=0.005, pixel_threshold=25, method='diff',
+                 size=(160, 90), max_static_frames=150):
+        """
+        Args:
+            sensitivity: Fraction of changed pixels that counts as motion
+                (lower = more sensitive)
+            pixel_threshold: Gray-level difference for a pixel to count as
+                changed (diff method)
+            method: 'diff' for frame differencing or 'mog2' for a background
+                subtractor
+            size: Resolution the frames are reduced to before comparison
+            max_static_frames: Force a detector run after this many static
+                frames in a row
+        """
+        if method not in ('diff', 'mog2'):
+            raise ValueError(f"Unknown motion gate method: {method}")
+        self.sensitivity = sensitivity
+        self.pixel_threshold = pixel_threshold
+        self.method = method
+        self.size = size
+        self.max_static_frames = max_static_frames
+        self.previous = None
+        self.subtractor = (cv2.createBackgroundSubtractorMOG2(detectShadows=False)
+                           if method == 'mog2' else None)
+        self.static_run = 0
+        self.stats = {'frames': 0, 'static_frames': 0}
+    
+    def update(self, gray):
+        """
+        Feed the next grayscale frame
+
+        Returns:
+            True if the scene moved since the previous frame
+        """
+        small = cv2.GaussianBlur(cv2.resize(gray, self.size, interpolation=cv2.INTER_AREA),
+                                 (5, 5), 0)
+        if self.subtractor is not None:
+            changed = np.count_nonzero(self.subtractor.apply(small)) / small.size
+        elif self.previous is None:
+            changed = 1.0
+        else:
+            diff = cv2.absdiff(small, self.previous)
+            changed = np.count_nonzero(diff > self.pixel_threshold) / small.size
+        self.previous = small
+        
+        moving = changed > self.sensitivity or self.static_run >= self.max_static_frames
+        self.static_run = 0 if moving else self.static_run + 1
+        self.stats['frames'] += 1
+        self.stats['static_frames'] += int(not moving)
+        return moving
+
+
+class FrameSink:
+    """
+    Streaming output of run_video
+
+    Sinks receive every processed frame as it is produced and must not keep
+    frames around, so memory use does not depend on the video length.
+    """
+    # Whether the sink uses the annotated frame (False = tracks only)
+    needs_frames = True
+    
+    def begin(self, fps, size):
+        """Called once with the source properties before the first frame"""
+    
+    def write(self, frame_index, annotated_frame, tracks):
+        """Consume one processed frame"""
+        raise NotImplementedError
+    
+    def close(self):
+        """Flush and release resources"""
+
+
+class VideoFileSink(FrameSink):
+    """Encode annotated frames into an AVI (XVID) file"""
+    def __init__(self, path, fps, size):
+        # Ensure output has correct extension
+        if not path.endswith(('.mp4', '.avi')):
+            path = path + '.avi'
+        
+        # Try AVI with XVID codec (most reliable on Windows)
+        if path.endswith('.mp4'):
+            path = path.replace('.mp4', '.avi')
+        self.path = path
+        
+        print(f"Initializing video writer...")
+        fourcc = cv2.VideoWriter_fourcc(*'XVID')
+        self.writer = cv2.VideoWriter(path, fourcc, fps, size)
+        self.opened = self.writer.isOpened()
+        
+        if self.opened:
+            print(f"✓ Video writer initialized: {path}")
+            print(f"  Format: AVI (XVID)")
+            print(f"  Resolution: {size[0]}x{size[1]}")
+            print(f"  FPS: {fps:g}")
+    
+    def write(self, frame_index, annotated_frame, tracks):
+        self.writer.write(annotated_frame)
+    
+    def close(self):
+        if not self.opened:
+            return
+        self.writer.release()
+        
+        # Verify file was created
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            file_size = os.path.getsize(self.path) / (1024 * 1024)  # MB
+            print(f"✓ Video saved successfully!")
+            print(f"  Location: {os.path.abspath(self.path)}")
+            print(f"  Size: {file_size:.2f} MB")
+        else:
+            print(f"✗ Warning: Video file not created or is empty")
+
+
+class ImageSequenceSink(FrameSink):
+    """Write annotated frames as numbered images from a background thread"""
+    def __init__(self, output_dir, every=1, queue_depth=32, extension='jpg'):
+        """
+        Args:
+            output_dir: Directory for the images (created if missing)
+            every: Keep one frame out of every N
+            queue_depth: Frames waiting to be written before write() blocks
+            extension: Image format passed to cv2.imwrite
+        """
+        self.output_dir = output_dir
+        self.every = max(1, every)
+        self.extension = extension
+        self.saved = 0
+        os.makedirs(output_dir, exist_ok=True)
+        self.pending = queue.Queue(maxsize=queue_depth)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def _run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            frame_index, frame = item
+            cv2.imwrite(os.path.join(self.output_dir, f"frame_{frame_index:06d}.{self.extension}"), frame)
+            self.saved += 1
+    
+    def write(self, frame_index, annotated_frame, tracks):
+        if frame_index % self.every == 0:
+            # Frames may be reused by the caller, so queue a private copy
+            self.pending.put((frame_index, annotated_frame.copy()))
+    
+    def close(self):
+        self.pending.put(None)
+        self.thread.join()
+        print(f"✓ {self.saved} frames saved to: {os.path.abspath(self.output_dir)}")
+
+
+class MOTTrackSink(FrameSink):
+    """
+    Write confirmed tracks as text in MOTChallenge format
+
+    One line per track and frame:
+    frame, id, left, top, width, height, confidence, class, -1, -1
+    (frames are numbered from 1, as in the MOT benchmarks).
+    """
+    needs_frames = False
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w')
+    
+    def write(self, frame_index, annotated_frame, tracks):
+        lines = []
+        for track_id, (x1, y1, x2, y2), class_id, confidence in zip(
+                tracks.ids.tolist(), tracks.bboxes.tolist(),
+                tracks.class_ids.tolist(), tracks.confidences.tolist()):
+            lines.append(f"{frame_index + 1},{track_id},{x1:.2f},{y1:.2f},"
+                         f"{x2 - x1:.2f},{y2 - y1:.2f},{confidence:.4f},{class_id},-1,-1\n")
+        self.file.writelines(lines)
+    
+    def close(self):
+        self.file.close()
+        print(f"✓ Tracks saved to: {os.path.abspath(self.path)}")
+
+
+class DetectionSink(FrameSink):
+    """
+    Write the raw detections of every frame, before tracking
+
+    MOTChallenge detection format (det.txt), one line per detection above
+    the confidence threshold:
+    frame, -1, left, top, width, height, confidence, class, -1, -1
+    Frames on which the detector did not run have no lines.
+    """
+    needs_frames = False
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w')
+        self.count = 0
+    
+    def write(self, frame_index, annotated_frame, tracks):
+        if tracks.detections is None:
+            return
+        lines = []
+        for x1, y1, x2, y2, confidence, class_id in tracks.detections.tolist():
+            lines.append(f"{frame_index + 1},-1,{x1:.2f},{y1:.2f},{x2 - x1:.2f},{y2 - y1:.2f},"
+                         f"{confidence:.4f},{int(class_id)},-1,-1\n")
+        self.file.writelines(lines)
+        self.count += len(lines)
+    
+    def close(self):
+        self.file.close()
+        print(f"✓ {self.count} detections saved to: {os.path.abspath(self.path)}")
+
+
+class TrackExporter(FrameSink):
+    """
+    Stream per-frame track records to a JSONL, Parquet or NumPy .npz file
+
+    Records are buffered as columns and flushed every flush_rows rows, so
+    memory stays bounded for videos of any length. Columns: frame,
+    timestamp (seconds from the start of the video), id, x1, y1, x2, y2,
+    class_id, confidence.
+    """
+    needs_frames = False
+    COLUMNS = (('frame', np.int64), ('timestamp', np.float64), ('id', np.int64),
+               ('x1', np.float32), ('y1', np.float32), ('x2', np.float32),
+               ('y2', np.float32), ('class_id', np.int32), ('confidence', np.float32))
+    FORMATS = {'.jsonl': 'jsonl', '.parquet': 'parquet', '.npz': 'npz'}
+    
+    def __init__(self, path, fmt=None, fps=None, flush_rows=10000):
+        """
+        Args:
+            path: Output file
+            fmt: 'jsonl', 'parquet' or 'npz' (inferred from the extension)
+            fps: Frame rate used for timestamps (taken from the source if None)
+            flush_rows: Buffered rows that trigger a write
+        """
+        if fmt is None:
+            fmt = self.FORMATS.get(os.path.splitext(path)[1].lower())
+        if fmt not in self.FORMATS.values():
+            raise ValueError(f"Unknown export format for {path} (use .jsonl, .parquet or .npz)")
+        self.path = path
+        self.fmt = fmt
+        self.fps = fps
+        self.flush_rows = flush_rows
+        self.buffer = {name: [] for name, _ in self.COLUMNS}
+        self.buffered_rows = 0
+        self.total_rows = 0
+        self.start_time = None
+        
+        if fmt == 'jsonl':
+            self.file = open(path, 'w')
+        elif fmt == 'parquet':
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError("Parquet export requires pyarrow (pip install pyarrow)")
+            self.pa = pyarrow
+            self.schema = pyarrow.schema([(name, pyarrow.from_numpy_dtype(dtype))
+                                          for name, dtype in self.COLUMNS])
+            self.file = pyarrow.parquet.ParquetWriter(path, self.schema)
+        else:
+            # .npz cannot be appended to, so columns are spooled to raw files
+            self.spool_dir = tempfile.mkdtemp(prefix='tracks_')
+            self.spool = {name: open(os.path.join(self.spool_dir, name), 'wb')
+                          for name, _ in self.COLUMNS}
+    
+    def begin(self, fps, size):
+        if self.fps is None and fps > 0:
+            self.fps = fps
+    
+    def write(self, frame_index, annotated_frame, tracks):
+        count = len(tracks)
+        if count == 0:
+            return
+        if self.fps:
+            timestamp = frame_index / self.fps
+        else:
+            # Live sources without a frame rate use wall-clock time
+            now = time.perf_counter()
+            self.start_time = self.start_time if self.start_time is not None else now
+            timestamp = now - self.start_time
+        
+        bboxes = tracks.bboxes
+        columns = (np.full(count, frame_index), np.full(count, timestamp), tracks.ids,
+                   bboxes[:, 0], bboxes[:, 1], bboxes[:, 2], bboxes[:, 3],
+                   tracks.class_ids, tracks.confidences)
+        for (name, dtype), values in zip(self.COLUMNS, columns):
+            self.buffer[name].append(np.asarray(values, dtype=dtype))
+        self.buffered_rows += count
+        if self.buffered_rows >= self.flush_rows:
+            self.flush()
+    
+    def flush(self):
+        """Write buffered rows to the output"""
+        if self.buffered_rows == 0:
+            return
+        columns = {name: np.concatenate(self.buffer[name]) for name, _ in self.COLUMNS}
+        
+        if self.fmt == 'jsonl':
+            names = list(columns)
+            # Round float32 columns so JSON does not show float32 noise
+            values = [np.round(columns[name].astype(np.float64), 4).tolist()
+                      if columns[name].dtype == np.float32 else columns[name].tolist()
+                      for name in names]
+            rows = zip(*values)
+            self.file.writelines(json.dumps(dict(zip(names, row))) + '\n' for row in rows)
+        elif self.fmt == 'parquet':
+            self.file.write_table(self.pa.Table.from_pydict(columns, schema=self.schema))
+        else:
+            for name, values in columns.items():
+                values.tofile(self.spool[name])
+        
+        self.total_rows += self.buffered_rows
+        self.buffer = {name: [] for name, _ in self.COLUMNS}
+        self.buffered_rows = 0
+    
+    def close(self):
+        self.flush()
+        if self.fmt == 'npz':
+            for spool_file in self.spool.values():
+                spool_file.close()
+            # Memory-mapped columns are written to the archive in chunks
+            arrays = {}
+            for name, dtype in self.COLUMNS:
+                spool_path = os.path.join(self.spool_dir, name)
+                if os.path.getsize(spool_path) > 0:
+                    arrays[name] = np.memmap(spool_path, dtype=dtype, mode='r')
+                else:
+                    arrays[name] = np.empty(0, dtype=dtype)
+            np.savez(self.path, **arrays)
+            del arrays
+            for name, _ in self.COLUMNS:
+                os.remove(os.path.join(self.spool_dir, name))
+            os.rmdir(self.spool_dir)
+        else:
+            self.file.close()
+        print(f"✓ {self.total_rows} track records exported to: {os.path.abspath(self.path)}")
+
+
+class DetectionCache:
+    """
+    Memory-mapped on-disk cache of raw YOLO detections for one video
+
+    Entries are keyed by a hash of the video content, the model name and
+    the settings that change what YOLO sees (inference size, regions,
+    tiling, NMS), and by frame index. Detections are stored before
+    confidence thresholding, so a cached video can be re-tracked with any
+    confidence_threshold or SimpleSORT parameters without running YOLO.
+    Dynamic ROI is not cacheable: its crops follow the confirmed tracks,
+    which depend on exactly those parameters.
+
+    Frames the detector skipped (keyframe mode) are recorded as missing and
+    frames the motion gate found static as reusing the previous detections;
+    both are filled in by any later run that does detect on them. Runs that
+    stopped early are extended from where they ended.
+
+    Layout of <cache_dir>/<key>/:
+        detections.f32  float32 rows [x1, y1, x2, y2, confidence, class_id]
+        index.i64       int64 [first row, row count] per frame
+                        (count MISSING = not detected yet,
+                         REUSED = previous detections reused)
+        meta.json       video, model, settings and number of frames covered
+    """
+    MISSING = -1
+    REUSED = -2
+    
+    def __init__(self, cache_dir, video_path, model_name, settings=None):
+        self.settings = settings or {}
+        self.key = self.video_key(video_path, model_name, self.settings)
+        self.path = os.path.join(cache_dir, self.key)
+        self.meta_path = os.path.join(self.path, 'meta.json')
+        self.detections_path = os.path.join(self.path, 'detections.f32')
+        self.index_path = os.path.join(self.path, 'index.i64')
+        self.video_path = video_path
+        self.model_name = model_name
+        self.detections_file = None
+        self.dirty = False
+        os.makedirs(self.path, exist_ok=True)
+        
+        self.loaded = os.path.exists(self.meta_path)
+        if self.loaded:
+            with open(self.meta_path) as f:
+                self.frame_count = json.load(f)['frames']
+            # The index is small (16 bytes per frame) and is updated in place,
+            # so it is read into memory; detections stay memory-mapped
+            self.index = np.fromfile(self.index_path, dtype=np.int64).reshape(-1, 2)[:self.frame_count].copy()
+            self.detections = self._memmap(self.detections_path, np.float32, 6)
+        else:
+            self.frame_count = 0
+            self.index = np.empty((0, 2), dtype=np.int64)
+            self.detections = np.empty((0, 6), dtype=np.float32)
+        self.rows = len(self.detections)
+    
+    @staticmethod
+    def video_key(video_path, model_name, settings=None, chunk_size=1 << 20):
+        """Hash of the file size, first and last MiB of the video, the model name and settings"""
+        digest = hashlib.sha1()
+        size = os.path.getsize(video_path)
+        digest.update(str(size).encode())
+        with open(video_path, 'rb') as f:
+            digest.update(f.read(chunk_size))
+            f.seek(max(0, size - chunk_size))
+            digest.update(f.read(chunk_size))
+        digest.update(os.path.basename(model_name).encode())
+        if settings:
+            digest.update(json.dumps(settings, sort_keys=True).encode())
+        return digest.hexdigest()[:16]
+    
+    @staticmethod
+    def _memmap(path, dtype, width):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return np.empty((0, width), dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r').reshape(-1, width)
+    
+    @property
+    def cached_frames(self):
+        """Number of frames with stored (or reused) detections"""
+        return int((self.index[:self.frame_count, 1] != self.MISSING).sum())
+    
+    @property
+    def complete(self):
+        """True when loaded from disk with detections for every covered frame"""
+        return self.loaded and self.frame_count > 0 and self.cached_frames == self.frame_count
+    
+    def read(self, frame_index):
+        """
+        Cached raw detections for a frame
+
+        Returns:
+            (N, 6) float32 array, or None if the frame is not cached or the
+            detector did not run on it
+        """
+        if frame_index >= self.frame_count:
+            return None
+        start, count = self.index[frame_index]
+        # Rows added during this run are not mapped until close()
+        if count < 0 or start + count > len(self.detections):
+            return None
+        return self.detections[start:start + count]
+    
+    def reused(self, frame_index):
+        """True if the frame reused the previous frame's detections (motion gate)"""
+        return frame_index < self.frame_count and self.index[frame_index, 1] == self.REUSED
+    
+    def write(self, frame_index, raw_detections, reused=False):
+        """
+        Store the raw detections of a frame
+
+        Args:
+            frame_index: Frame number
+            raw_detections: (N, 6) array, or None if the detector was skipped
+            reused: The motion gate reused the previous detections for this
+                frame (raw_detections is ignored)
+
+        New frames must be written in order; frames already covered are
+        only updated with more information (missing -> reused -> detected).
+        """
+        if reused:
+            raw_detections = None
+        if frame_index < self.frame_count:
+            current = self.index[frame_index, 1]
+            if current >= 0 or (raw_detections is None and (not reused or current == self.REUSED)):
+                return
+        elif frame_index != self.frame_count:
+            return
+        
+        if raw_detections is None:
+            entry = (self.rows, self.REUSED if reused else self.MISSING)
+        else:
+            if self.detections_file is None:
+                self.detections_file = open(self.detections_path, 'ab')
+            raw_detections = np.ascontiguousarray(raw_detections, dtype=np.float32)
+            raw_detections.tofile(self.detections_file)
+            entry = (self.rows, len(raw_detections))
+            self.rows += len(raw_detections)
+        
+        if frame_index == self.frame_count:
+            if self.frame_count == len(self.index):
+                grown = np.empty((max(64, 2 * len(self.index)), 2), dtype=np.int64)
+                grown[:self.frame_count] = self.index
+                self.index = grown
+            self.frame_count += 1
+        self.index[frame_index] = entry
+        self.dirty = True
+    
+    def close(self):
+        """Save new and filled-in frames; they become readable after this"""
+        if not self.dirty:
+            return
+        if self.detections_file is not None:
+            self.detections_file.close()
+            self.detections_file = None
+        # Replace index and meta atomically so a crash leaves the old cache intact
+        self.index[:self.frame_count].tofile(self.index_path + '.tmp')
+        os.replace(self.index_path + '.tmp', self.index_path)
+        with open(self.meta_path + '.tmp', 'w') as f:
+            json.dump({'video': os.path.abspath(self.video_path), 'model': self.model_name,
+                       'settings': self.settings, 'frames': self.frame_count,
+                       'detections': self.rows}, f)
+        os.replace(self.meta_path + '.tmp', self.meta_path)
+        print(f"✓ Cached detections for {self.cached_frames} of {self.frame_count} frames: "
+              f"{os.path.abspath(self.path)}")
+        self.loaded = True
+        self.dirty = False
+        self.detections = self._memmap(self.detections_path, np.float32, 6)
+
+
+def replay_detections(cache, confidence_threshold=0.5, **tracker_params):
+    """
+    Re-run SimpleSORT over cached detections, without decoding video or running YOLO
+
+    Frames on which the detector was skipped when the cache was filled are
+    coasted with the motion model, as in keyframe mode; frames the motion
+    gate found static are updated with the previous detections again, as
+    in the live run.
+
+    Args:
+        cache: DetectionCache with cached frames
+        confidence_threshold: Minimum confidence for detections
+        **tracker_params: SimpleSORT arguments (max_age, min_hits, ...)
+
+    Yields:
+        (frame_index, TrackView) for every cached frame
+    """
+    tracker = SimpleSORT(**tracker_params)
+    previous = None
+    for frame_index in range(cache.frame_count):
+        raw = cache.read(frame_index)
+        if raw is None and cache.reused(frame_index):
+            raw = previous
+        if raw is None:
+            tracks = tracker.predict()
+        else:
+            previous = raw
+            tracks = tracker.update(raw[raw[:, 4] >= confidence_threshold])
+        yield frame_index, tracks
+
+
+def make_palette(size=64):
+    """Distinct BGR colors spread around the hue circle by the golden ratio"""
+    hues = (np.arange(size) * 0.618033988749895 % 1.0 * 180).astype(np.uint8)
+    hsv = np.stack([hues, np.full(size, 220, np.uint8), np.full(size, 255, np.uint8)], axis=1)
+    bgr = cv2.cvtColor(hsv[None], cv2.COLOR_HSV2BGR)[0]
+    return [tuple(map(int, color)) for color in bgr]
+
+
+# Track colors are looked up by ID, so no per-track state is kept
+TRACK_PALETTE = make_palette()
+
+
+class TrailStore:
+    """
+    Fixed-size ring buffers of recent track centers, stored in one array
+
+    Rows are indexed by TrackTable slot and tagged with the owning track ID,
+    so a slot reused by a new track starts a fresh trail. Memory is bounded
+    by the number of live tracks times the trail length.
+    """
+    def __init__(self, length=30, capacity=64):
+        self.length = length
+        self.points = np.zeros((capacity, length, 2), dtype=np.int32)
+        self.head = np.zeros(capacity, dtype=np.intp)
+        self.count = np.zeros(capacity, dtype=np.intp)
+        self.owner = np.full(capacity, -1, dtype=np.int64)
+    
+    def _ensure_capacity(self, capacity):
+        extra = capacity - len(self.owner)
+        if extra <= 0:
+            return
+        extra = max(extra, len(self.owner))
+        self.points = np.concatenate([self.points, np.zeros((extra, self.length, 2), np.int32)])
+        self.head = np.concatenate([self.head, np.zeros(extra, np.intp)])
+        self.count = np.concatenate([self.count, np.zeros(extra, np.intp)])
+        self.owner = np.concatenate([self.owner, np.full(extra, -1, np.int64)])
+    
+    def update(self, slots, ids, centers):
+        """Append one center per track"""
+        if len(slots) == 0:
+            return
+        self._ensure_capacity(int(slots.max()) + 1)
+        
+        # Slots taken over by a different track start over
+        reused = slots[self.owner[slots] != ids]
+        self.count[reused] = 0
+        self.head[reused] = 0
+        self.owner[slots] = ids
+        
+        self.points[slots, self.head[slots]] = centers
+        self.head[slots] = (self.head[slots] + 1) % self.length
+        self.count[slots] = np.minimum(self.count[slots] + 1, self.length)
+    
+    def retain(self, slots):
+        """Drop the trails of every slot not in `slots`"""
+        keep = np.zeros(len(self.owner), dtype=bool)
+        keep[slots] = True
+        self.count[~keep] = 0
+        self.owner[~keep] = -1
+    
+    def polylines(self, slots):
+        """Trails of the given slots, oldest point first, as (n, 2) arrays"""
+        lines = []
+        for slot in slots:
+            count = self.count[slot]
+            if count > 1:
+                order = (self.head[slot] - count + np.arange(count)) % self.length
+                lines.append(self.points[slot, order])
+        return lines
 
 
 class ObjectDetectionTracker:
-    def __init__(self, model_name='yolov8n.pt', confidence_threshold=0.5):
+    def __init__(self, model_name='yolov8n.pt', confidence_threshold=0.5,
+                 detect_interval=1, adaptive=False, propagation='kalman',
+                 motion_threshold=0.04, uncertainty_threshold=0.5, model=None,
+                 profile=False, inference_size=None, roi=None, dynamic_roi=False,
+                 roi_margin=0.5, roi_refresh=10, tiles=None, tile_overlap=0.2,
+                 nms_threshold=0.5, motion_gate=None, tracker_params=None):
         """
         Initialize the object detection and tracking system
         
         Args:
             model_name: YOLO model to use (yolov8n.pt, yolov8s.pt, etc.)
             confidence_threshold: Minimum confidence for detections
+            detect_interval: Run the detector every N frames and propagate
+                tracks in between (1 = detect on every frame)
+            adaptive: Also run the detector early when scene motion or
+                track uncertainty rises above the thresholds below
+            propagation: How to move tracks on skipped frames
+                ('kalman' motion model or 'flow' for sparse optical flow)
+            motion_threshold: Mean absolute frame difference (0-1) since the
+                last detector frame that triggers detection in adaptive mode
+            uncertainty_threshold: Track position std relative to box size
+                that triggers detection in adaptive mode
+            model: Already loaded YOLO model to share between trackers
+                (model_name is not loaded when given)
+            profile: Record per-stage timings in self.profiler
+            inference_size: Downscale images so their longer side is at most
+                this many pixels before YOLO (None = full resolution)
+            roi: Static regions [(x1, y1, x2, y2), ...] to run YOLO on
+                instead of the whole frame
+            dynamic_roi: Run YOLO only on crops around active tracks, with a
+                full-frame pass every roi_refresh detector frames to pick up
+                new objects
+            roi_margin: Padding around each track crop, as a fraction of the
+                box size
+            roi_refresh: Detector frames between full-frame passes
+            tiles: (rows, cols) grid of overlapping tiles per region, for
+                small objects in large frames
+            tile_overlap: Fraction of each tile shared with its neighbours
+            nms_threshold: IoU above which duplicate boxes from overlapping
+                crops or tiles are merged
+            motion_gate: Optional MotionGate; when it sees no motion the
+                detector is skipped and the previous detections are reused
+            tracker_params: SimpleSORT arguments overriding the defaults
+                (max_age, min_hits, iou_threshold, assignment, motion_model)
+
+        Boxes found in crops, tiles and downscaled images are mapped back to
+        full-frame coordinates before tracking.
         """
-        print(f"Loading YOLO model: {model_name}...")
-        self.model = YOLO(model_name)
+        if propagation not in ('kalman', 'flow'):
+            raise ValueError(f"Unknown propagation method: {propagation}")
+        if model is None:
+            print(f"Loading YOLO model: {model_name}...")
+            model = YOLO(model_name)
+        self.model = model
+        self.model_name = model_name
         self.confidence_threshold = confidence_threshold
-        self.tracker = SimpleSORT(max_age=30, min_hits=3, iou_threshold=0.3)
-        self.track_history = defaultdict(lambda: [])
-        self.colors = {}
+        self.tracker = SimpleSORT(**{'max_age': 30, 'min_hits': 3, 'iou_threshold': 0.3,
+                                     **(tracker_params or {})})
+        self.trails = TrailStore(length=30)
+        self.profiler = StageProfiler(enabled=profile)
+        
+        # Keyframe mode
+        self.detect_interval = max(1, int(detect_interval))
+        self.adaptive = adaptive
+        self.propagation = propagation
+        self.motion_threshold = motion_threshold
+        self.uncertainty_threshold = uncertainty_threshold
+        self.frames_since_detection = None
+        self.last_detection_count = 0
+        self.keyframe_thumb = None
+        self.prev_gray = None
+        self.stats = {'detector_frames': 0, 'propagated_frames': 0, 'gated_frames': 0}
+        
+        # Motion gating
+        self.motion_gate = motion_gate
+        self.last_raw_detections = None
+        
+        # Inference regions
+        self.inference_size = inference_size
+        self.roi = [tuple(map(int, region)) for region in roi] if roi else None
+        self.dynamic_roi = dynamic_roi
+        self.roi_margin = roi_margin
+        self.roi_refresh = max(1, int(roi_refresh))
+        self.tiles = tuple(tiles) if tiles else None
+        self.tile_overlap = tile_overlap
+        self.nms_threshold = nms_threshold
+        
+        # Raw detection cache (set by run_video)
+        self.detection_cache = None
+        self.frame_index = 0
         
     def get_color(self, track_id):
-        """Generate consistent color for each track ID"""
-        if track_id not in self.colors:
-            np.random.seed(track_id)
-            self.colors[track_id] = tuple(map(int, np.random.randint(0, 255, 3)))
-        return self.colors[track_id]
+        """Consistent color for each track ID"""
+        return TRACK_PALETTE[track_id % len(TRACK_PALETTE)]
+    
+    def detect(self, frame):
+        """
+        Run YOLO on a frame
+
+        Returns:
+            (N, 6) array of [x1, y1, x2, y2, confidence, class_id] above the
+            confidence threshold
+        """
+        return self._threshold(self.detect_raw(frame))
+    
+    def detect_raw(self, frame):
+        """Detections for the current frame before thresholding, from the cache if possible"""
+        cached = self._cached(self.frame_index)
+        if cached is not None:
+            return cached
+        return self._detect_frames([frame])[0]
+    
+    def _detect_frames(self, frames):
+        """Raw detections for several frames with a single model call"""
+        views = [self._inference_views(frame) for frame in frames]
+        results = self._run_model([image for frame_views in views for image, _, _ in frame_views])
+        return self._merge_views(views, results)
+    
+    def _track_regions(self, width, height):
+        """Padded, merged crops around the confirmed tracks"""
+        tracks = self.tracker._confirmed()
+        if len(tracks) == 0:
+            return None
+        boxes = tracks.bboxes
+        pad = (boxes[:, 2:4] - boxes[:, 0:2]) * self.roi_margin + 16
+        crops = np.hstack([boxes[:, 0:2] - pad, boxes[:, 2:4] + pad])
+        crops = np.clip(crops, 0, [width, height, width, height]).astype(int)
+        regions = merge_regions(crops.tolist())
+        area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in regions)
+        # Large crops cost about as much as the full frame
+        if area > 0.6 * width * height:
+            return None
+        return regions
+    
+    def _inference_views(self, frame):
+        """
+        Images to send to YOLO for a frame
+
+        Returns:
+            List of (image, (offset_x, offset_y), scale) where a box in image
+            coordinates maps to the frame as box / scale + offset
+        """
+        height, width = frame.shape[:2]
+        if self.roi:
+            # Regions outside the frame would give YOLO empty images
+            regions = clip_regions(self.roi, width, height)
+        else:
+            regions = [(0, 0, width, height)]
+        if (self.dynamic_roi and self.roi is None and
+                self.stats['detector_frames'] % self.roi_refresh != 0):
+            regions = self._track_regions(width, height) or regions
+        if self.tiles:
+            regions = clip_regions([tile for region in regions
+                                    for tile in split_tiles(region, *self.tiles, self.tile_overlap)],
+                                   width, height)
+        
+        views = []
+        with self.profiler.stage('resize'):
+            for x1, y1, x2, y2 in regions:
+                image = frame if (x1, y1, x2, y2) == (0, 0, width, height) else frame[y1:y2, x1:x2]
+                scale = 1.0
+                longest = max(image.shape[:2])
+                if self.inference_size and longest > self.inference_size:
+                    scale = self.inference_size / longest
+                    image = cv2.resize(image, None, fx=scale, fy=scale,
+                                       interpolation=cv2.INTER_AREA)
+                views.append((image, (x1, y1), scale))
+        return views
+    
+    def _merge_views(self, views, results):
+        """Map per-view results back to frame coordinates, one array per frame"""
+        merged = []
+        index = 0
+        for frame_views in views:
+            parts = []
+            for _, offset, scale in frame_views:
+                raw = self._extract_detections(results[index])
+                index += 1
+                raw[:, :4] = raw[:, :4] / scale + np.tile(np.array(offset, np.float32), 2)
+                parts.append(raw)
+            # No parts when every region lies outside the frame
+            raw = np.concatenate(parts) if parts else np.empty((0, 6), dtype=np.float32)
+            if len(frame_views) > 1:
+                raw = nms(raw, self.nms_threshold)
+            merged.append(raw)
+        return merged
+    
+    def _run_model(self, images):
+        """Call YOLO and record its preprocess/inference/postprocess times"""
+        if not images:
+            return []
+        if not self.profiler.enabled:
+            return self.model(images, verbose=False)
+        start = time.perf_counter()
+        results = self.model(images, verbose=False)
+        self._record_model_time(results, time.perf_counter() - start)
+        return results
+    
+    def _record_model_time(self, results, seconds):
+        """Profile a model call from the per-image speeds in its results, or its wall time"""
+        if not self.profiler.enabled:
+            return
+        speed = getattr(results[0], 'speed', None) if len(results) else None
+        if not speed:
+            self.profiler.record('inference', seconds)
+            return
+        # Ultralytics reports per-image milliseconds for each phase
+        for result in results:
+            for stage in ('preprocess', 'inference', 'postprocess'):
+                if result.speed.get(stage) is not None:
+                    self.profiler.record(stage, result.speed[stage] / 1000)
+    
+    def _detection_settings(self):
+        """Options that change the raw detections, part of the detection cache key"""
+        return {'inference_size': self.inference_size,
+                'roi': [list(region) for region in self.roi] if self.roi else None,
+                'tiles': list(self.tiles) if self.tiles else None,
+                'tile_overlap': self.tile_overlap if self.tiles else None,
+                'nms_threshold': self.nms_threshold}
+    
+    def _cached(self, frame_index):
+        """Raw detections from the detection cache, or None"""
+        if self.detection_cache is None:
+            return None
+        return self.detection_cache.read(frame_index)
+    
+    def _extract_detections(self, results):
+        """Convert a YOLO result into a raw detection array"""
+        if results.boxes is None:
+            return np.empty((0, 6), dtype=np.float32)
+        with self.profiler.stage('transfer'):
+            boxes = results.boxes.xyxy.cpu().numpy()
+            confidences = results.boxes.conf.cpu().numpy()
+            class_ids = results.boxes.cls.cpu().numpy()
+        return np.column_stack([boxes, confidences, class_ids]).astype(np.float32)
+    
+    def _threshold(self, raw_detections):
+        """Keep detections above the confidence threshold"""
+        return raw_detections[raw_detections[:, 4] >= self.confidence_threshold]
+    
+    def _thumbnail(self, gray):
+        """Small grayscale copy of a frame for cheap motion estimates"""
+        return cv2.resize(gray, (160, 90), interpolation=cv2.INTER_AREA)
+    
+    def _track_uncertainty(self):
+        """Largest position std of any live track relative to its size"""
+        tracks = self.tracker.tracks
+        live = tracks.live_slots()
+        if self.tracker.kalman is None or len(live) == 0:
+            return 0.0
+        variance = tracks.covariance[live, 0, 0] + tracks.covariance[live, 1, 1]
+        size = np.clip(tracks.mean[live, 2:4].mean(axis=1), 1, None)
+        return float(np.max(np.sqrt(variance) / size))
+    
+    def should_detect(self, gray=None):
+        """Decide whether the detector must run on the current frame"""
+        if self.frames_since_detection is None:
+            return True
+        if self.frames_since_detection + 1 >= self.detect_interval:
+            return True
+        if not self.adaptive:
+            return False
+        if len(self.tracker.tracks) == 0:
+            return True
+        if self._track_uncertainty() > self.uncertainty_threshold:
+            return True
+        if gray is not None and self.keyframe_thumb is not None:
+            diff = cv2.absdiff(self._thumbnail(gray), self.keyframe_thumb)
+            if diff.mean() / 255.0 > self.motion_threshold:
+                return True
+        return False
+    
+    def _propagate_flow(self, gray):
+        """Shift live tracks by the median optical flow inside each box"""
+        tracks = self.tracker.tracks
+        live = tracks.live_slots()
+        if self.prev_gray is None or len(live) == 0:
+            return self.tracker.predict()
+        
+        # Sample a 3x3 grid of points inside every box
+        grid = np.array([0.25, 0.5, 0.75], dtype=np.float32)
+        gx, gy = np.meshgrid(grid, grid)
+        boxes = tracks.bbox[live]
+        wh = boxes[:, 2:4] - boxes[:, 0:2]
+        points = (boxes[:, None, 0:2] +
+                  np.stack([gx.ravel(), gy.ravel()], axis=1)[None] * wh[:, None, :])
+        points = points.reshape(-1, 1, 2).astype(np.float32)
+        
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, points, None)
+        flow = (moved - points).reshape(len(live), 9, 2)
+        valid = status.reshape(len(live), 9).astype(bool)
+        flow[~valid] = np.nan
+        # Tracks whose points were all lost keep their position
+        offsets = np.zeros((len(live), 2), dtype=np.float32)
+        has_flow = valid.any(axis=1)
+        offsets[has_flow] = np.nanmedian(flow[has_flow], axis=1)
+        return self.tracker.shift(live, offsets)
+    
+    def _advance(self, frame, gray, raw_detections, gated=False):
+        """
+        Update tracks with raw detections, or propagate them when None
+
+        gated marks detections reused from an earlier frame by the motion gate.
+        """
+        if self.detection_cache is not None:
+            # Detections reused by the motion gate belong to an earlier frame
+            self.detection_cache.write(self.frame_index, raw_detections, reused=gated)
+        self.frame_index += 1
+        
+        if raw_detections is not None:
+            self.last_raw_detections = raw_detections
+            detections = self._threshold(raw_detections)
+            with self.profiler.stage('track'):
+                tracks = self.tracker.update(detections)
+            tracks.detections = detections
+            self.last_detection_count = len(detections)
+            self.frames_since_detection = 0
+            self.stats['gated_frames' if gated else 'detector_frames'] += 1
+            if self.adaptive and gray is not None:
+                self.keyframe_thumb = self._thumbnail(gray)
+        else:
+            with self.profiler.stage('track'):
+                if self.propagation == 'flow':
+                    tracks = self._propagate_flow(gray)
+                else:
+                    tracks = self.tracker.predict()
+            self.frames_since_detection += 1
+            self.stats['propagated_frames'] += 1
+        
+        if self.propagation == 'flow':
+            self.prev_gray = gray
+        return tracks
+    
+    def _gray(self, frame):
+        """Grayscale frame, only computed when a mode needs it"""
+        if self.adaptive or self.propagation == 'flow' or self.motion_gate is not None:
+            return cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return None
+    
+    def _is_static(self, gray):
+        """
+        Feed the motion gate with a frame (every frame must pass through here)
+
+        Returns:
+            True if nothing moved and earlier detections can be reused
+        """
+        if self.motion_gate is None:
+            return False
+        moving = self.motion_gate.update(gray)
+        return not moving and self.last_raw_detections is not None
+    
+    def track(self, frame):
+        """
+        Update tracks for a frame, running the detector only on keyframes
+
+        Returns:
+            TrackView of the confirmed tracks
+        """
+        gray = self._gray(frame)
+        static = self._is_static(gray)
+        if not self.should_detect(gray):
+            return self._advance(frame, gray, None)
+        if static and self._cached(self.frame_index) is None:
+            return self._advance(frame, gray, self.last_raw_detections, gated=True)
+        return self._advance(frame, gray, self.detect_raw(frame))
+    
+    def track_batch(self, frames):
+        """
+        Update tracks for consecutive frames with one model call
+
+        All keyframes in the batch go through YOLO together, then the tracker
+        is updated frame by frame in order. Keyframes are chosen by
+        detect_interval only; adaptive triggers need per-frame tracker state
+        and are not applied here. Keyframes the motion gate finds static
+        reuse the latest earlier detections.
+
+        Returns:
+            List of TrackView, one per frame
+        """
+        grays = [self._gray(frame) for frame in frames]
+        static = [self._is_static(gray) for gray in grays]
+        
+        keyframes = []
+        counter = self.frames_since_detection
+        for i in range(len(frames)):
+            if counter is None or counter + 1 >= self.detect_interval:
+                keyframes.append(i)
+                counter = 0
+            else:
+                counter += 1
+        
+        detections = {}
+        for i in keyframes:
+            cached = self._cached(self.frame_index + i)
+            if cached is not None:
+                detections[i] = cached
+        pending = [i for i in keyframes if i not in detections and not static[i]]
+        if pending:
+            detections.update(zip(pending, self._detect_frames([frames[i] for i in pending])))
+        
+        keyframes = set(keyframes)
+        outputs = []
+        for i, frame in enumerate(frames):
+            if i in keyframes and i not in detections:
+                # Static keyframe: _advance reuses the latest detections
+                outputs.append(self._advance(frame, grays[i], self.last_raw_detections, gated=True))
+            else:
+                outputs.append(self._advance(frame, grays[i], detections.get(i)))
+        return outputs
+    
+    def _iter_tracks(self, cap, batch_size=1, max_wait=0.05):
+        """Yield (frame, tracks) for every frame of a capture"""
+        if batch_size <= 1:
+            while True:
+                with self.profiler.stage('decode'):
+                    ret, frame = cap.read()
+                if not ret:
+                    print("End of video or error reading frame")
+                    return
+                yield frame, self.track(frame)
+        
+        reader = FrameReader(cap, queue_size=2 * batch_size, profiler=self.profiler)
+        try:
+            while True:
+                batch = reader.read_batch(batch_size, max_wait)
+                if not batch:
+                    print("End of video or error reading frame")
+                    return
+                yield from zip(batch, self.track_batch(batch))
+        finally:
+            reader.stop()
     
     def process_frame(self, frame, show_trails=True):
         """
@@ -129,31 +1836,34 @@ class ObjectDetectionTracker:
         Returns:
             Annotated frame with detections and tracks
         """
-        # Run YOLO detection
-        results = self.model(frame, verbose=False)[0]
+        tracks = self.track(frame)
+        return self.draw(frame, tracks, show_trails)
+    
+    def draw(self, frame, tracks, show_trails=True):
+        """
+        Draw tracks, trails and statistics on a copy of the frame
         
-        # Extract detections
-        detections = []
-        if results.boxes is not None:
-            boxes = results.boxes.xyxy.cpu().numpy()
-            confidences = results.boxes.conf.cpu().numpy()
-            class_ids = results.boxes.cls.cpu().numpy()
+        Args:
+            frame: Input frame from video
+            tracks: TrackView returned by the tracker
+            show_trails: Whether to show tracking trails
             
-            for box, conf, cls_id in zip(boxes, confidences, class_ids):
-                if conf >= self.confidence_threshold:
-                    detections.append([*box, conf, cls_id])
-        
-        # Update tracker
-        tracks = self.tracker.update(detections)
-        
+        Returns:
+            Annotated frame
+        """
         # Draw detections and tracks
         annotated_frame = frame.copy()
+        bboxes = tracks.bboxes.astype(int)
         
-        for track in tracks:
-            x1, y1, x2, y2 = map(int, track['bbox'])
-            track_id = track['id']
-            class_id = track['class_id']
-            confidence = track['confidence']
+        # Track center points for trails; trails of dropped tracks are evicted
+        centers = (bboxes[:, 0:2] + bboxes[:, 2:4]) // 2
+        self.trails.update(tracks.slots, tracks.ids, centers)
+        self.trails.retain(tracks.slots)
+        
+        for track_id, bbox, class_id, confidence in zip(
+                tracks.ids.tolist(), bboxes.tolist(),
+                tracks.class_ids.tolist(), tracks.confidences.tolist()):
+            x1, y1, x2, y2 = bbox
             
             # Get class name
             class_name = self.model.names[class_id]
@@ -171,28 +1881,26 @@ class ObjectDetectionTracker:
                          (x1 + label_size[0], y1), color, -1)
             cv2.putText(annotated_frame, label, (x1, y1 - 5), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            
-            # Track center point for trails
-            center = ((x1 + x2) // 2, (y1 + y2) // 2)
-            self.track_history[track_id].append(center)
-            
-            # Keep only last 30 points
-            if len(self.track_history[track_id]) > 30:
-                self.track_history[track_id].pop(0)
-            
-            # Draw tracking trail
-            if show_trails and len(self.track_history[track_id]) > 1:
-                points = np.array(self.track_history[track_id], dtype=np.int32)
-                cv2.polylines(annotated_frame, [points], False, color, 2)
+        
+        # Draw tracking trails, one polylines call per palette color
+        if show_trails and len(tracks) > 0:
+            color_index = tracks.ids % len(TRACK_PALETTE)
+            for index in np.unique(color_index):
+                lines = self.trails.polylines(tracks.slots[color_index == index])
+                if lines:
+                    cv2.polylines(annotated_frame, lines, False, TRACK_PALETTE[index], 2)
         
         # Display statistics
-        info_text = f"Detected: {len(detections)} | Tracked: {len(tracks)}"
+        info_text = f"Detected: {self.last_detection_count} | Tracked: {len(tracks)}"
         cv2.putText(annotated_frame, info_text, (10, 30), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
         
         return annotated_frame
     
-    def run_video(self, source=0, show_trails=True, save_output=None):
+    def run_video(self, source=0, show_trails=True, save_output=None,
+                  batch_size=1, max_wait=0.05, threaded=False, queue_depth=8,
+                  drop_oldest=None, headless=False, sinks=None, annotate=None,
+                  cache_dir=None, profile_output=None):
         """
         Run detection and tracking on video source
         
@@ -200,6 +1908,26 @@ class ObjectDetectionTracker:
             source: Video source (0 for webcam, or path to video file)
             show_trails: Whether to show tracking trails
             save_output: Path to save output video (optional)
+            batch_size: Frames sent to YOLO per call; above 1 frames are
+                decoded by a background reader and inferred in batches
+            max_wait: Longest time in seconds to wait for a batch to fill
+            threaded: Run decode, inference and annotate+encode on separate
+                threads connected by bounded queues
+            queue_depth: Capacity of each queue in threaded mode
+            drop_oldest: Drop stale frames when a queue is full; defaults to
+                True for webcams and network streams
+            headless: Make no GUI calls (no window, no keyboard controls)
+            sinks: Extra FrameSink outputs fed with every processed frame
+            annotate: Draw boxes, labels and trails; defaults to False only
+                when headless and every sink consumes tracks only
+            cache_dir: Directory of the raw detection cache; frames already
+                cached for this video and model skip YOLO, new ones are stored
+            profile_output: Write stage timings here at the end (JSON, or
+                Prometheus text for .prom/.txt); enables profiling
+
+        Returns:
+            Run summary (frames, seconds, fps and frame counters), or None if
+            the source could not be opened
         """
         cap = cv2.VideoCapture(source)
         
@@ -208,71 +1936,90 @@ class ObjectDetectionTracker:
             return
         
         # Get video properties
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
+        # Keep the exact rate (29.97, not 29) so exported timestamps do not drift
+        fps = cap.get(cv2.CAP_PROP_FPS)
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
-        print(f"Video: {width}x{height} @ {fps}fps")
+        print(f"Video: {width}x{height} @ {fps:g}fps")
+        if profile_output:
+            self.profiler.enabled = True
         
-        # Setup video writer if saving output
-        writer = None
-        frames_to_save = []  # Fallback: store frames in memory
+        # Detection cache (files only, live sources have no stable content)
+        self.frame_index = 0
+        if cache_dir and self.dynamic_roi:
+            print("✗ Detection cache disabled: dynamic ROI crops depend on the tracker state")
+        elif cache_dir and isinstance(source, str) and os.path.isfile(source):
+            self.detection_cache = DetectionCache(cache_dir, source, self.model_name,
+                                                  self._detection_settings())
+            if self.detection_cache.cached_frames:
+                print(f"Using cached detections for {self.detection_cache.cached_frames} of "
+                      f"{self.detection_cache.frame_count} frames")
+        
+        # Setup outputs
+        sinks = list(sinks or [])
         if save_output:
-            # Ensure output has correct extension
-            if not save_output.endswith(('.mp4', '.avi')):
-                save_output = save_output + '.avi'
-            
-            # Try AVI with XVID codec (most reliable on Windows)
-            if save_output.endswith('.mp4'):
-                save_output = save_output.replace('.mp4', '.avi')
-            
-            print(f"Initializing video writer...")
-            fourcc = cv2.VideoWriter_fourcc(*'XVID')
-            writer = cv2.VideoWriter(save_output, fourcc, fps, (width, height))
-            
-            # Test write
-            if writer.isOpened():
-                print(f"✓ Video writer initialized: {save_output}")
-                print(f"  Format: AVI (XVID)")
-                print(f"  Resolution: {width}x{height}")
-                print(f"  FPS: {fps}")
+            video_sink = VideoFileSink(save_output, fps, (width, height))
+            if video_sink.opened:
+                sinks.append(video_sink)
             else:
                 print("✗ VideoWriter failed, will save frames as images instead")
-                writer = None
+                # Fallback: save every 10th frame as image
+                output_dir = os.path.splitext(video_sink.path)[0] + '_frames'
+                sinks.append(ImageSequenceSink(output_dir, every=10))
         
-        print("\nControls:")
-        print("  'q' - Quit")
-        print("  't' - Toggle trails")
-        print("  's' - Take screenshot")
+        if annotate is None:
+            annotate = not headless or any(sink.needs_frames for sink in sinks)
+        for sink in sinks:
+            sink.begin(fps, (width, height))
+        
+        if not headless:
+            print("\nControls:")
+            print("  'q' - Quit")
+            print("  't' - Toggle trails")
+            print("  's' - Take screenshot")
         print("\nProcessing...")
         
         frame_count = 0
+        start_time = time.perf_counter()
+        
+        def render(frame, tracks):
+            nonlocal frame_count
+            # Draw results (zero-render mode passes the frame through)
+            with self.profiler.stage('draw'):
+                annotated_frame = self.draw(frame, tracks, show_trails) if annotate else frame
+            
+            with self.profiler.stage('encode'):
+                for sink in sinks:
+                    sink.write(frame_count, annotated_frame, tracks)
+            
+            frame_count += 1
+            self.profiler.frame_done()
+            return annotated_frame
+        
+        if threaded:
+            if drop_oldest is None:
+                drop_oldest = isinstance(source, int) or str(source).startswith(
+                    ('rtsp://', 'rtmp://', 'http://', 'https://'))
+            pipeline = TrackingPipeline(self, cap, render, queue_depth, drop_oldest,
+                                        batch_size, max_wait)
+            outputs = pipeline.outputs()
+        else:
+            pipeline = None
+            frames = self._iter_tracks(cap, batch_size, max_wait)
+            outputs = (render(frame, tracks) for frame, tracks in frames)
         
         try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    print("End of video or error reading frame")
-                    break
-                
-                # Process frame
-                annotated_frame = self.process_frame(frame, show_trails)
-                
-                # Save frame if recording
-                if writer and writer.isOpened():
-                    writer.write(annotated_frame)
-                elif save_output:
-                    # Fallback: save every 10th frame as image
-                    if frame_count % 10 == 0:
-                        frames_to_save.append(annotated_frame.copy())
+            for annotated_frame in outputs:
+                if headless:
+                    continue
                 
                 # Display frame
-                cv2.imshow('Object Detection and Tracking', annotated_frame)
-                
-                frame_count += 1
-                
-                # Handle keyboard input
-                key = cv2.waitKey(1) & 0xFF
+                with self.profiler.stage('display'):
+                    cv2.imshow('Object Detection and Tracking', annotated_frame)
+                    
+                    # Handle keyboard input
+                    key = cv2.waitKey(1) & 0xFF
                 if key == ord('q'):
                     print("\nStopping...")
                     break
@@ -284,37 +2031,605 @@ class ObjectDetectionTracker:
                     cv2.imwrite(screenshot_path, annotated_frame)
                     print(f"Screenshot saved: {screenshot_path}")
         
+        except KeyboardInterrupt:
+            print("\nStopping...")
+        
         finally:
+            if pipeline is not None:
+                pipeline.stop()
+            else:
+                frames.close()
             print(f"\nProcessed {frame_count} frames")
+            print(f"  Detector frames: {self.stats['detector_frames']}")
+            print(f"  Propagated frames: {self.stats['propagated_frames']}")
+            if self.motion_gate is not None:
+                print(f"  Motion-gated frames: {self.stats['gated_frames']} "
+                      f"({self.motion_gate.stats['static_frames']} of "
+                      f"{self.motion_gate.stats['frames']} frames static)")
             cap.release()
             
-            if writer and writer.isOpened():
-                writer.release()
-                
-                # Verify file was created
-                import os
-                if os.path.exists(save_output) and os.path.getsize(save_output) > 0:
-                    file_size = os.path.getsize(save_output) / (1024 * 1024)  # MB
-                    print(f"✓ Video saved successfully!")
-                    print(f"  Location: {os.path.abspath(save_output)}")
-                    print(f"  Size: {file_size:.2f} MB")
-                else:
-                    print(f"✗ Warning: Video file not created or is empty")
-            elif save_output and len(frames_to_save) > 0:
-                # Fallback: save as individual images
-                import os
-                output_dir = save_output.replace('.avi', '').replace('.mp4', '') + '_frames'
-                os.makedirs(output_dir, exist_ok=True)
-                print(f"Video codec failed. Saving {len(frames_to_save)} frames as images...")
-                for i, frame in enumerate(frames_to_save):
-                    cv2.imwrite(f"{output_dir}/frame_{i:04d}.jpg", frame)
-                print(f"✓ Frames saved to: {os.path.abspath(output_dir)}")
+            for sink in sinks:
+                sink.close()
+            
+            if self.profiler.enabled:
+                self.profiler.print_summary()
+                if profile_output:
+                    self.profiler.save(profile_output)
             
-            cv2.destroyAllWindows()
+            if self.detection_cache is not None:
+                self.detection_cache.close()
+                self.detection_cache = None
+            
+            if not headless:
+                cv2.destroyAllWindows()
+        
+        elapsed = time.perf_counter() - start_time
+        return {'frames': frame_count, 'seconds': elapsed,
+                'fps': frame_count / elapsed if elapsed > 0 else 0.0, **self.stats}
+
+
+class MultiStreamTracker:
+    """
+    Track many video sources with one shared YOLO model
+
+    Each stream has its own ObjectDetectionTracker (and so its own SimpleSORT
+    and track history) and a FrameReader thread. The scheduler visits the
+    streams round-robin, takes at most one ready frame from each, and sends
+    all frames that need detection to the model in a single call.
+    """
+    def __init__(self, sources, model_name='yolov8n.pt', confidence_threshold=0.5,
+                 max_batch=None, queue_depth=4, make_tracker=None, **tracker_kwargs):
+        """
+        Args:
+            sources: List of video sources (webcam indices, files or URLs)
+            model_name: YOLO model shared by all streams
+            confidence_threshold: Minimum confidence for detections
+            max_batch: Most frames per model call (defaults to one per stream)
+            queue_depth: Decoded frames buffered per stream; live sources
+                drop the oldest frame when full
+            make_tracker: Optional callable (model) -> ObjectDetectionTracker
+                used instead of tracker_kwargs, e.g. to give every stream
+                its own MotionGate
+            **tracker_kwargs: Keyframe options passed to each
+                ObjectDetectionTracker
+        """
+        print(f"Loading YOLO model: {model_name}...")
+        self.model = YOLO(model_name)
+        self.sources = list(sources)
+        self.max_batch = max_batch or len(self.sources)
+        self.queue_depth = queue_depth
+        if make_tracker is None:
+            def make_tracker(model):
+                return ObjectDetectionTracker(model_name=model_name,
+                                              confidence_threshold=confidence_threshold,
+                                              model=model, **tracker_kwargs)
+        self.trackers = [make_tracker(self.model) for _ in self.sources]
+        self.readers = []
+        self.caps = []
+        self.next_stream = 0
+        self.stream_stats = [{'frames': 0, 'lag': 0.0, 'start': None} for _ in self.sources]
+    
+    def open(self):
+        """Open every source and start its decode thread"""
+        for source in self.sources:
+            cap = cv2.VideoCapture(source)
+            if not cap.isOpened():
+                print(f"Error: Could not open video source {source}")
+            live = isinstance(source, int) or str(source).startswith(
+                ('rtsp://', 'rtmp://', 'http://', 'https://'))
+            self.caps.append(cap)
+            self.readers.append(FrameReader(cap, self.queue_depth, drop_oldest=live))
+    
+    def close(self):
+        """Stop decode threads and release every source"""
+        for reader in self.readers:
+            reader.stop()
+        for cap in self.caps:
+            cap.release()
+        self.readers = []
+        self.caps = []
+    
+    def _gather(self):
+        """Take at most one ready frame per stream, round-robin from the last position"""
+        count = len(self.readers)
+        picked = []
+        for offset in range(count):
+            if len(picked) >= self.max_batch:
+                break
+            index = (self.next_stream + offset) % count
+            reader = self.readers[index]
+            if reader.finished:
+                continue
+            item = reader.poll()
+            if item is not None and not reader.finished:
+                picked.append((index, *item))
+        # The next round starts after the last stream served
+        if picked:
+            self.next_stream = (picked[-1][0] + 1) % count
+        return picked
+    
+    def step(self):
+        """
+        Run one scheduling round
+
+        Returns:
+            List of (stream_index, frame, tracks) for the frames processed
+        """
+        picked = self._gather()
+        if not picked:
+            return []
+        
+        grays = [self.trackers[index]._gray(frame) for index, frame, _ in picked]
+        static = [self.trackers[index]._is_static(grays[i])
+                  for i, (index, _, _) in enumerate(picked)]
+        keyframes = [i for i, (index, _, _) in enumerate(picked)
+                     if self.trackers[index].should_detect(grays[i])]
+        to_detect = [i for i in keyframes if not static[i]]
+        detections = {i: self.trackers[picked[i][0]].last_raw_detections
+                      for i in keyframes if static[i]}
+        if to_detect:
+            # Every stream maps its own crops/tiles, but all go through one model call
+            views = [self.trackers[picked[i][0]]._inference_views(picked[i][1]) for i in to_detect]
+            images = [image for frame_views in views for image, _, _ in frame_views]
+            started = time.perf_counter()
+            results = self.model(images, verbose=False) if images else []
+            elapsed = time.perf_counter() - started
+            start = 0
+            for i, frame_views in zip(to_detect, views):
+                tracker = self.trackers[picked[i][0]]
+                stream_results = results[start:start + len(frame_views)]
+                # Each stream is charged its share of the shared call
+                tracker._record_model_time(stream_results, elapsed * len(frame_views) / len(images))
+                detections[i] = tracker._merge_views([frame_views], stream_results)[0]
+                start += len(frame_views)
+        
+        outputs = []
+        now = time.perf_counter()
+        for i, (index, frame, captured_at) in enumerate(picked):
+            tracker = self.trackers[index]
+            tracks = tracker._advance(frame, grays[i], detections.get(i),
+                                      gated=i in detections and static[i])
+            tracker.profiler.frame_done()
+            stats = self.stream_stats[index]
+            if stats['start'] is None:
+                stats['start'] = captured_at
+            stats['frames'] += 1
+            # Exponential moving average of capture-to-result latency
+            stats['lag'] = 0.9 * stats['lag'] + 0.1 * (now - captured_at)
+            outputs.append((index, frame, tracks))
+        return outputs
+    
+    def report(self):
+        """Per-stream frame count, FPS and lag"""
+        now = time.perf_counter()
+        report = []
+        for index, stats in enumerate(self.stream_stats):
+            elapsed = now - stats['start'] if stats['start'] is not None else 0.0
+            report.append({
+                'stream': index,
+                'source': self.sources[index],
+                'frames': stats['frames'],
+                'fps': stats['frames'] / elapsed if elapsed > 0 else 0.0,
+                'lag_ms': stats['lag'] * 1000,
+            })
+        return report
+    
+    def print_report(self):
+        """Print the per-stream report"""
+        for row in self.report():
+            print(f"  [{row['stream']}] {row['source']}: {row['frames']} frames, "
+                  f"{row['fps']:.1f} fps, lag {row['lag_ms']:.0f} ms")
+    
+    def run(self, on_result=None, report_interval=5.0, sinks=None, show_trails=True):
+        """
+        Process all streams until every source has ended
+
+        Args:
+            on_result: Optional callback (stream_index, frame, tracks) called
+                for each processed frame
+            report_interval: Seconds between printed FPS/lag reports
+            sinks: Optional list with one list of FrameSink outputs per
+                stream; frames are annotated only for sinks that need them
+            show_trails: Draw trails on annotated frames
+
+        Returns:
+            The per-stream report (see report())
+        """
+        sinks = sinks or [[] for _ in self.sources]
+        self.open()
+        for cap, stream_sinks in zip(self.caps, sinks):
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+            for sink in stream_sinks:
+                sink.begin(fps, size)
+        last_report = time.perf_counter()
+        try:
+            while not all(reader.finished for reader in self.readers):
+                outputs = self.step()
+                if not outputs:
+                    time.sleep(0.002)
+                for index, frame, tracks in outputs:
+                    if sinks[index]:
+                        tracker = self.trackers[index]
+                        annotate = any(sink.needs_frames for sink in sinks[index])
+                        with tracker.profiler.stage('draw'):
+                            annotated = tracker.draw(frame, tracks, show_trails) if annotate else frame
+                        with tracker.profiler.stage('encode'):
+                            for sink in sinks[index]:
+                                sink.write(self.stream_stats[index]['frames'] - 1, annotated, tracks)
+                    if on_result is not None:
+                        on_result(index, frame, tracks)
+                if time.perf_counter() - last_report >= report_interval:
+                    print("Streams:")
+                    self.print_report()
+                    last_report = time.perf_counter()
+        except KeyboardInterrupt:
+            print("\nStopping...")
+        finally:
+            self.close()
+            for stream_sinks in sinks:
+                for sink in stream_sinks:
+                    sink.close()
+            print("\nFinal stream report:")
+            self.print_report()
+        return self.report()
+
+
+# Model loaded once per batch worker process
+_worker_model = None
+
+
+def _init_worker(model_name):
+    """Process pool initializer: load the model once per worker"""
+    global _worker_model
+    _worker_model = YOLO(model_name)
+
+
+def build_tracker(options, model=None):
+    """Create an ObjectDetectionTracker from a CLI/config options dict"""
+    motion_gate = None
+    if options.get('motion_gate'):
+        motion_gate = MotionGate(sensitivity=options['motion_sensitivity'],
+                                 pixel_threshold=options['pixel_threshold'],
+                                 method=options['motion_gate'],
+                                 max_static_frames=options['max_static_frames'])
+    return ObjectDetectionTracker(
+        model_name=options['model'],
+        confidence_threshold=options['conf'],
+        detect_interval=options['detect_interval'],
+        adaptive=options['adaptive'],
+        propagation=options['propagation'],
+        motion_threshold=options['motion_threshold'],
+        uncertainty_threshold=options['uncertainty_threshold'],
+        model=model,
+        inference_size=options['inference_size'],
+        roi=options['roi'],
+        dynamic_roi=options['dynamic_roi'],
+        roi_margin=options['roi_margin'],
+        roi_refresh=options['roi_refresh'],
+        tiles=options['tiles'],
+        tile_overlap=options['tile_overlap'],
+        nms_threshold=options['nms_threshold'],
+        motion_gate=motion_gate,
+        tracker_params={
+            'max_age': options['max_age'],
+            'min_hits': options['min_hits'],
+            'iou_threshold': options['iou_threshold'],
+            'assignment': options['assignment'],
+            'motion_model': None if options['motion_model'] == 'none' else 'kalman',
+        },
+    )
+
+
+def output_stems(sources):
+    """
+    Unique output name (without suffix) for every source
+
+    Files keep their path relative to the deepest folder shared by all
+    inputs, so cam1/video.mp4 and cam2/video.mp4 do not overwrite each
+    other; webcams are named webcam<index> and stream URLs after their
+    host and path (rtsp://cam2/stream -> cam2_stream). Names still clashing
+    get a numeric suffix.
+    """
+    files = [os.path.abspath(source) for source in sources
+             if isinstance(source, str) and '://' not in source]
+    try:
+        root = os.path.commonpath([os.path.dirname(path) for path in files]) if files else ''
+    except ValueError:  # Paths on different drives
+        root = None
+    stems = []
+    used = set()
+    for source in sources:
+        if isinstance(source, str) and '://' in source:
+            address = source.split('://', 1)[1]
+            stem = ''.join(c if c.isalnum() or c in '-.' else '_' for c in address).strip('_') or 'stream'
+        elif isinstance(source, str):
+            path = os.path.abspath(source)
+            name = os.path.relpath(path, root) if root is not None else os.path.basename(path)
+            stem = os.path.splitext(name)[0]
+        else:
+            stem = f"webcam{source}"
+        unique, suffix = stem, 2
+        while unique in used:
+            unique, suffix = f"{stem}_{suffix}", suffix + 1
+        used.add(unique)
+        stems.append(unique)
+    return stems
+
+
+def process_source(source, options, stem=None):
+    """
+    Track one input with the given options (runs inside a batch worker)
+
+    Args:
+        source: Video file, stream URL or webcam index
+        options: Parsed CLI/config options
+        stem: Output name relative to output_dir (see output_stems)
+
+    Returns:
+        Summary dict with the source, status and run_video statistics
+    """
+    if _worker_model is None:
+        _init_worker(options['model'])
+    tracker = build_tracker(options, model=_worker_model)
+    
+    stem = os.path.join(options['output_dir'], stem or output_stems([source])[0])
+    os.makedirs(os.path.dirname(stem), exist_ok=True)
+    sinks = []
+    if options['export']:
+        sinks.append(TrackExporter(f"{stem}_tracks.{options['export']}"))
+    if options['mot']:
+        sinks.append(MOTTrackSink(f"{stem}_mot.txt"))
+    if options['detections']:
+        sinks.append(DetectionSink(f"{stem}_detections.txt"))
+    
+    try:
+        summary = tracker.run_video(
+            source=source,
+            show_trails=not options['no_trails'],
+            save_output=f"{stem}_tracked.avi" if options['save_video'] else None,
+            batch_size=options['batch_size'],
+            max_wait=options['max_wait'],
+            threaded=options['threaded'],
+            queue_depth=options['queue_depth'],
+            drop_oldest=options['drop_oldest'],
+            headless=not options['gui'],
+            sinks=sinks,
+            cache_dir=options['cache_dir'],
+            profile_output=f"{stem}_profile.json" if options['profile'] else None,
+        )
+    except Exception as e:
+        return {'source': str(source), 'status': f"error: {e}"}
+    if summary is None:
+        return {'source': str(source), 'status': 'error: could not open source'}
+    return {'source': str(source), 'status': 'ok', **summary}
+
+
+def run_streams(sources, stems, options):
+    """
+    Track all inputs at once as concurrent streams sharing one model (--streams)
+
+    Returns:
+        Summary dicts in the same form as process_source, one per input
+    """
+    def make_tracker(model):
+        tracker = build_tracker(options, model=model)
+        tracker.profiler.enabled = options['profile']
+        return tracker
+    
+    multi = MultiStreamTracker(sources, model_name=options['model'],
+                               max_batch=options['batch_size'] if options['batch_size'] > 1 else None,
+                               queue_depth=options['queue_depth'], make_tracker=make_tracker)
+    paths = [os.path.join(options['output_dir'], stem) for stem in stems]
+    sinks = []
+    for path in paths:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        stream_sinks = []
+        if options['export']:
+            stream_sinks.append(TrackExporter(f"{path}_tracks.{options['export']}"))
+        if options['mot']:
+            stream_sinks.append(MOTTrackSink(f"{path}_mot.txt"))
+        if options['detections']:
+            stream_sinks.append(DetectionSink(f"{path}_detections.txt"))
+        sinks.append(stream_sinks)
+    
+    start = time.perf_counter()
+    report = multi.run(sinks=sinks, show_trails=not options['no_trails'])
+    elapsed = time.perf_counter() - start
+    
+    results = []
+    for row, tracker, path in zip(report, multi.trackers, paths):
+        if options['profile']:
+            tracker.profiler.save(f"{path}_profile.json")
+        status = 'ok' if row['frames'] else 'error: no frames read'
+        results.append({'source': str(row['source']), 'status': status, 'frames': row['frames'],
+                        'seconds': elapsed, 'fps': row['fps'], **tracker.stats})
+    return results
+
+
+def expand_inputs(patterns):
+    """
+    Expand glob patterns; plain integers are webcam indices, stream URLs
+    (rtsp://, http://, ...) and existing paths are used as given
+    """
+    sources = []
+    for pattern in patterns:
+        if pattern.isdigit():
+            sources.append(int(pattern))
+            continue
+        if '://' in pattern or os.path.exists(pattern):
+            sources.append(pattern)
+            continue
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if matches:
+            sources.extend(matches)
+        else:
+            print(f"Warning: no input matches {pattern}")
+    return sources
+
+
+def load_config(path, known=None):
+    """
+    Read a JSON or YAML config file of option names to values
+
+    Args:
+        path: Config file
+        known: Accepted option names; any other key raises ValueError
+    """
+    with open(path) as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml  # installed with ultralytics
+            config = yaml.safe_load(f) or {}
+        else:
+            config = json.load(f)
+    # Accept both "detect-interval" and "detect_interval" style keys
+    config = {key.replace('-', '_'): value for key, value in config.items()}
+    if known is not None:
+        unknown = sorted(set(config) - set(known))
+        if unknown:
+            raise ValueError(f"Unknown option(s) in {path}: {', '.join(unknown)}")
+    return config
+
+
+def build_parser():
+    """Command line options for batch runs"""
+    parser = argparse.ArgumentParser(
+        description="Object detection and tracking over many videos",
+        epilog="Options can also come from --config (JSON or YAML); "
+               "command line values take precedence.")
+    parser.add_argument('inputs', nargs='*', help="Video files, glob patterns or webcam indices")
+    parser.add_argument('--config', help="JSON/YAML file with any of the options below")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Parallel worker processes, each with its own model")
+    parser.add_argument('--streams', action='store_true',
+                        help="Process all inputs at the same time in one process, batching "
+                             "their frames through one model (cameras and live feeds)")
+    parser.add_argument('--output-dir', default='outputs')
+    parser.add_argument('--report', help="Write the per-file summary as JSON")
+    
+    detector = parser.add_argument_group('detector')
+    detector.add_argument('--model', default='yolov8n.pt')
+    detector.add_argument('--conf', type=float, default=0.5, help="Confidence threshold")
+    detector.add_argument('--detect-interval', type=int, default=1)
+    detector.add_argument('--adaptive', action='store_true')
+    detector.add_argument('--propagation', choices=['kalman', 'flow'], default='kalman')
+    detector.add_argument('--motion-threshold', type=float, default=0.04,
+                          help="Scene change that triggers detection in adaptive mode")
+    detector.add_argument('--uncertainty-threshold', type=float, default=0.5,
+                          help="Track uncertainty that triggers detection in adaptive mode")
+    detector.add_argument('--batch-size', type=int, default=1)
+    detector.add_argument('--max-wait', type=float, default=0.05)
+    detector.add_argument('--inference-size', type=int, default=None)
+    detector.add_argument('--roi', type=int, nargs=4, action='append', default=None,
+                          metavar=('X1', 'Y1', 'X2', 'Y2'))
+    detector.add_argument('--dynamic-roi', action='store_true')
+    detector.add_argument('--roi-margin', type=float, default=0.5)
+    detector.add_argument('--roi-refresh', type=int, default=10)
+    detector.add_argument('--tiles', type=int, nargs=2, default=None, metavar=('ROWS', 'COLS'))
+    detector.add_argument('--tile-overlap', type=float, default=0.2)
+    detector.add_argument('--nms-threshold', type=float, default=0.5)
+    detector.add_argument('--motion-gate', choices=['diff', 'mog2'], default=None)
+    detector.add_argument('--motion-sensitivity', type=float, default=0.005)
+    detector.add_argument('--pixel-threshold', type=int, default=25)
+    detector.add_argument('--max-static-frames', type=int, default=150)
+    detector.add_argument('--cache-dir', default=None, help="Raw detection cache directory")
+    
+    tracker = parser.add_argument_group('tracker')
+    tracker.add_argument('--max-age', type=int, default=30)
+    tracker.add_argument('--min-hits', type=int, default=3)
+    tracker.add_argument('--iou-threshold', type=float, default=0.3)
+    tracker.add_argument('--assignment', choices=list(ASSIGNMENT_METHODS), default='greedy')
+    tracker.add_argument('--motion-model', choices=['kalman', 'none'], default='kalman')
+    
+    output = parser.add_argument_group('output')
+    output.add_argument('--gui', action='store_true', help="Show the video window (single worker)")
+    output.add_argument('--threaded', action='store_true')
+    output.add_argument('--queue-depth', type=int, default=8)
+    output.add_argument('--drop-oldest', action=argparse.BooleanOptionalAction, default=None,
+                        help="Drop stale frames when a queue is full (default: live sources only)")
+    output.add_argument('--no-trails', action='store_true')
+    output.add_argument('--save-video', action='store_true')
+    output.add_argument('--export', choices=['jsonl', 'parquet', 'npz'], default=None)
+    output.add_argument('--mot', action='store_true', help="Write MOTChallenge-format tracks")
+    output.add_argument('--detections', action='store_true',
+                        help="Write the raw per-frame detections (MOTChallenge det.txt format)")
+    output.add_argument('--profile', action='store_true', help="Save per-stage timings")
+    return parser
+
+
+def print_report(results, elapsed):
+    """Print per-file throughput"""
+    print("\n" + "=" * 60)
+    print("Batch summary")
+    print("=" * 60)
+    total_frames = 0
+    for result in results:
+        if result['status'] == 'ok':
+            total_frames += result['frames']
+            print(f"  {result['source']}: {result['frames']} frames in "
+                  f"{result['seconds']:.1f}s ({result['fps']:.1f} fps, "
+                  f"{result['detector_frames']} detector frames)")
+        else:
+            print(f"  {result['source']}: {result['status']}")
+    print(f"Total: {len(results)} inputs, {total_frames} frames in {elapsed:.1f}s "
+          f"({total_frames / elapsed if elapsed > 0 else 0.0:.1f} fps overall)")
+
+
+def run_batch(argv):
+    """Non-interactive entry point for scripted and parallel runs"""
+    parser = build_parser()
+    args, _ = parser.parse_known_args(argv)
+    if args.config:
+        try:
+            config = load_config(args.config, known=[action.dest for action in parser._actions])
+        except ValueError as e:
+            parser.error(str(e))
+        parser.set_defaults(**config)
+    args = parser.parse_args(argv)
+    options = vars(args)
+    
+    sources = expand_inputs([str(source) for source in args.inputs])
+    if not sources:
+        parser.error("no inputs given (on the command line or in the config 'inputs')")
+    if args.gui and args.workers > 1:
+        parser.error("--gui needs a single worker")
+    if args.streams and (args.gui or args.workers > 1 or args.save_video):
+        parser.error("--streams runs headless in one process (no --gui, --workers or --save-video)")
+    
+    stems = output_stems(sources)
+    start = time.perf_counter()
+    results = []
+    if args.streams:
+        results = run_streams(sources, stems, options)
+    elif args.workers <= 1:
+        for source, stem in zip(sources, stems):
+            results.append(process_source(source, options, stem))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(args.model,)) as pool:
+            futures = {pool.submit(process_source, source, options, stem): source
+                       for source, stem in zip(sources, stems)}
+            for future in as_completed(futures):
+                results.append(future.result())
+        # Report in input order
+        order = {str(source): i for i, source in enumerate(sources)}
+        results.sort(key=lambda result: order[result['source']])
+    elapsed = time.perf_counter() - start
+    
+    print_report(results, elapsed)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'seconds': elapsed, 'results': results}, f, indent=2)
+        print(f"✓ Report saved to: {os.path.abspath(args.report)}")
+    return 0 if all(result['status'] == 'ok' for result in results) else 1
 
 
 def main():
     """Main function to run the tracker"""
+    # Any command line arguments switch to the non-interactive batch mode
+    if len(sys.argv) > 1:
+        sys.exit(run_batch(sys.argv[1:]))
+    
     print("=" * 60)
     print("Real-time Object Detection and Tracking System")
     print("=" * 60)
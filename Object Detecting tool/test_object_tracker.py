@@ -0,0 +1,315 @@
+"""
+Tests for the object tracker's state, caches and helpers
+Run: python -m pytest "Object Detecting tool"
+
+YOLO is replaced by a small stub, so no model download or GPU is needed.
+"""
+
+import importlib.util
+import os
+import sys
+import types
+
+import cv2
+import numpy as np
+import pytest
+
+
+class StubYOLO:
+    """Stands in for ultralytics.YOLO: the same boxes for every image"""
+
+    def __init__(self, name='stub.pt', boxes=((100, 80, 160, 140, 0.9, 0), (10, 10, 30, 30, 0.3, 2))):
+        self.boxes = np.array(boxes, dtype=np.float32).reshape(-1, 6)
+        self.calls = 0
+
+    def __call__(self, images, verbose=False, **kwargs):
+        self.calls += 1
+        return [StubResult(self.boxes) for _ in images]
+
+
+class StubTensor:
+    def __init__(self, array):
+        self.array = array
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.array
+
+
+class StubResult:
+    def __init__(self, boxes):
+        self.boxes = types.SimpleNamespace(xyxy=StubTensor(boxes[:, :4]), conf=StubTensor(boxes[:, 4]),
+                                           cls=StubTensor(boxes[:, 5]))
+        self.speed = {'preprocess': 1.0, 'inference': 5.0, 'postprocess': 0.5}
+
+
+if importlib.util.find_spec('ultralytics') is None:  # The tests never load a real model
+    sys.modules['ultralytics'] = types.SimpleNamespace(YOLO=StubYOLO)
+
+import Object_tracker
+from Object_tracker import (DetectionCache, KalmanBoxFilter, MotionGate, SimpleSORT, TrackTable,
+                            TrailStore, nms, output_stems, replay_detections, split_tiles)
+
+
+class BaselineSORT:
+    """The original list-of-dicts SimpleSORT, kept as a reference"""
+
+    def __init__(self, max_age=30, min_hits=3, iou_threshold=0.3):
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.tracks = []
+        self.track_id_counter = 0
+
+    def iou(self, box1, box2):
+        x1 = max(box1[0], box2[0])
+        y1 = max(box1[1], box2[1])
+        x2 = min(box1[2], box2[2])
+        y2 = min(box1[3], box2[3])
+        intersection = max(0, x2 - x1) * max(0, y2 - y1)
+        area1 = (box1[2] - box1[0]) * (box1[3] - box1[1])
+        area2 = (box2[2] - box2[0]) * (box2[3] - box2[1])
+        union = area1 + area2 - intersection
+        return intersection / union if union > 0 else 0
+
+    def new_track(self, det):
+        self.tracks.append({'id': self.track_id_counter, 'bbox': det[:4], 'class_id': int(det[5]),
+                            'confidence': det[4], 'age': 0, 'hits': 1, 'total_hits': 1})
+        self.track_id_counter += 1
+
+    def update(self, detections):
+        for track in self.tracks:
+            track['age'] += 1
+            track['hits'] = 0
+        if len(detections) > 0 and len(self.tracks) > 0:
+            iou_matrix = np.zeros((len(detections), len(self.tracks)))
+            for d, det in enumerate(detections):
+                for t, track in enumerate(self.tracks):
+                    iou_matrix[d, t] = self.iou(det[:4], track['bbox'])
+            matched_indices = set()
+            for _ in range(min(len(detections), len(self.tracks))):
+                if np.max(iou_matrix) < self.iou_threshold:
+                    break
+                d, t = np.unravel_index(np.argmax(iou_matrix), iou_matrix.shape)
+                self.tracks[t].update(bbox=detections[d][:4], class_id=int(detections[d][5]),
+                                      confidence=detections[d][4], age=0)
+                self.tracks[t]['hits'] += 1
+                self.tracks[t]['total_hits'] += 1
+                matched_indices.add(d)
+                iou_matrix[d, :] = -1
+                iou_matrix[:, t] = -1
+            for d, det in enumerate(detections):
+                if d not in matched_indices:
+                    self.new_track(det)
+        elif len(detections) > 0:
+            for det in detections:
+                self.new_track(det)
+        self.tracks = [t for t in self.tracks if t['age'] < self.max_age]
+        return [t for t in self.tracks if t['total_hits'] >= self.min_hits]
+
+
+def scene(num_frames=150, num_objects=8, seed=0):
+    """Detections of objects moving in straight lines, with misses, clutter and empty frames"""
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(0, 600, (num_objects, 2))
+    velocity = rng.uniform(-4, 4, (num_objects, 2))
+    size = rng.uniform(20, 60, (num_objects, 2))
+    classes = rng.integers(0, 3, num_objects)
+    for frame in range(num_frames):
+        if frame % 37 == 36:
+            yield np.empty((0, 6), dtype=np.float32)
+            continue
+        centers = start + velocity * frame + rng.normal(0, 1.5, (num_objects, 2))
+        boxes = np.hstack([centers - size / 2, centers + size / 2])
+        detections = np.column_stack([boxes, rng.uniform(0.5, 1.0, num_objects), classes])
+        detections = detections[rng.random(num_objects) > 0.15]
+        clutter = rng.uniform(0, 600, (rng.integers(0, 3), 2))
+        clutter = np.column_stack([clutter, clutter + 15, np.full((len(clutter), 2), (0.6, 1))])
+        yield np.vstack([detections, clutter]).astype(np.float32)
+
+
+def test_simple_sort_without_motion_model_matches_baseline():
+    baseline = BaselineSORT()
+    tracker = SimpleSORT(motion_model=None)
+    for frame, detections in enumerate(scene()):
+        expected = sorted(baseline.update(detections), key=lambda track: track['id'])
+        tracks = tracker.update(detections)
+        order = np.argsort(tracks.ids)
+        assert tracks.ids[order].tolist() == [track['id'] for track in expected], frame
+        assert tracks.class_ids[order].tolist() == [track['class_id'] for track in expected]
+        np.testing.assert_array_equal(tracks.bboxes[order].reshape(-1, 4),
+                                      np.array([track['bbox'] for track in expected]).reshape(-1, 4))
+        np.testing.assert_array_equal(tracks.confidences[order], [track['confidence'] for track in expected])
+
+
+def test_track_table_reuses_free_slots_and_grows():
+    table = TrackTable(capacity=2)
+    assert table.allocate(2).tolist() == [0, 1]
+    assert table.allocate(1).tolist() == [2]
+    assert table.capacity == 4 and len(table) == 3
+    table.id[:3] = [10, 11, 12]
+
+    table.release(np.array([1]))
+    assert table.live_slots().tolist() == [0, 2]
+    assert table.allocate(1).tolist() == [1]
+    assert table.capacity == 4 and len(table) == 3
+    # Growing keeps the existing columns
+    table.allocate(3)
+    assert table.capacity == 8 and table.id[[0, 2]].tolist() == [10, 12]
+
+
+def test_track_views_are_read_only_snapshots():
+    tracker = SimpleSORT(min_hits=1)
+    tracks = tracker.update(np.array([[0, 0, 10, 10, 0.9, 1]], dtype=np.float32))
+    with pytest.raises(ValueError):
+        tracks.bboxes[0, 0] = 5
+    tracker.update(np.array([[1, 1, 11, 11, 0.8, 1]], dtype=np.float32))
+    assert tracks.bboxes[0].tolist() == [0, 0, 10, 10]
+
+
+def test_kalman_filter_follows_constant_velocity():
+    kalman = KalmanBoxFilter()
+    box = np.array([[100.0, 50.0, 140.0, 90.0]])
+    step = np.array([[6.0, -2.0, 6.0, -2.0]])
+    mean, covariance = kalman.initiate(box)
+    for frame in range(1, 40):
+        mean, covariance = kalman.predict(mean, covariance)
+        mean, covariance = kalman.update(mean, covariance, box + step * frame)
+    mean, _ = kalman.predict(mean, covariance)
+    predicted = Object_tracker.cxcywh_to_xyxy(mean[:, :4])
+    np.testing.assert_allclose(predicted, box + step * 40, atol=0.5)
+    np.testing.assert_allclose(mean[0, 4:8], [6.0, -2.0, 0.0, 0.0], atol=0.1)
+
+
+def test_kalman_tracker_keeps_ids_across_skipped_frames():
+    box = np.array([0, 0, 20, 20, 0.9, 0], dtype=np.float32)
+    results = {}
+    for motion_model in ('kalman', None):
+        tracker = SimpleSORT(min_hits=1, motion_model=motion_model)
+        # Moves 4 px per frame: detected for 20 frames, then skipped for 8
+        for frame in range(29):
+            detections = (box + [4 * frame, 0, 4 * frame, 0, 0, 0])[None]
+            tracks = tracker.update(detections) if frame < 20 or frame == 28 else tracker.predict()
+        results[motion_model] = tracks.ids.tolist()
+    assert results['kalman'] == [0]
+    # Without a motion model the box has moved too far and becomes a new track
+    assert 1 in results[None]
+
+
+def test_nms_is_class_aware():
+    detections = np.array([[0, 0, 10, 10, 0.8, 0],
+                           [1, 1, 11, 11, 0.9, 0],
+                           [1, 1, 11, 11, 0.7, 1],
+                           [50, 50, 60, 60, 0.6, 0]], dtype=np.float32)
+    kept = nms(detections, iou_threshold=0.5)
+    assert kept[:, 4].tolist() == pytest.approx([0.9, 0.7, 0.6])
+
+
+def test_split_tiles_cover_the_region():
+    region = (10, 20, 410, 320)
+    tiles = split_tiles(region, rows=2, cols=3, overlap=0.25)
+    assert len(tiles) == 6
+    assert min(t[0] for t in tiles) == 10 and min(t[1] for t in tiles) == 20
+    assert max(t[2] for t in tiles) == 410 and max(t[3] for t in tiles) == 320
+    # Neighbouring tiles overlap
+    assert tiles[0][2] > tiles[1][0] and tiles[0][3] > tiles[3][1]
+
+
+def test_trail_store_restarts_reused_slots():
+    trails = TrailStore(length=4, capacity=1)
+    slots = np.array([0, 1])
+    for step in range(6):
+        trails.update(slots, np.array([5, 6]), np.array([[step, 0], [0, step]]))
+    lines = trails.polylines(slots)
+    assert lines[0][:, 0].tolist() == [2, 3, 4, 5]  # ring buffer keeps the newest points
+
+    # Slot 1 is taken over by track 7: its trail starts over
+    trails.retain(np.array([0]))
+    trails.update(np.array([0, 1]), np.array([5, 7]), np.array([[6, 0], [100, 100]]))
+    assert trails.count[1] == 1
+    trails.update(np.array([1]), np.array([7]), np.array([[101, 101]]))
+    assert trails.polylines(np.array([1]))[0].tolist() == [[100, 100], [101, 101]]
+
+
+def test_output_stems_are_unique():
+    sources = [os.path.join('cam1', 'video.mp4'), os.path.join('cam2', 'video.mp4'), 0,
+               'rtsp://cam3/stream', os.path.join('cam1', 'video.mp4')]
+    assert output_stems(sources) == [os.path.join('cam1', 'video'), os.path.join('cam2', 'video'),
+                                     'webcam0', 'cam3_stream', os.path.join('cam1', 'video_2')]
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    path = tmp_path / 'video.bin'
+    path.write_bytes(b'not really a video' * 100)
+    return str(path)
+
+
+def detections(value, count=2):
+    return np.full((count, 6), value, dtype=np.float32)
+
+
+def test_detection_cache_round_trip_and_fill_in(tmp_path, video_file):
+    cache = DetectionCache(str(tmp_path), video_file, 'stub.pt', {'inference_size': 640})
+    cache.write(0, detections(1))
+    cache.write(1, None)
+    cache.write(2, None, reused=True)
+    cache.write(3, detections(3, count=0))
+    assert cache.read(0) is None  # not readable until close()
+    cache.close()
+
+    cache = DetectionCache(str(tmp_path), video_file, 'stub.pt', {'inference_size': 640})
+    assert cache.frame_count == 4 and cache.cached_frames == 3 and not cache.complete
+    np.testing.assert_array_equal(cache.read(0), detections(1))
+    assert cache.read(1) is None and not cache.reused(1)
+    assert cache.read(2) is None and cache.reused(2)
+    assert len(cache.read(3)) == 0
+
+    # A later run fills the missing frame, keeps detected ones and extends the end
+    cache.write(0, detections(9))
+    cache.write(1, detections(2))
+    cache.write(4, detections(4))
+    cache.write(6, detections(6))  # gap: ignored
+    cache.close()
+
+    cache = DetectionCache(str(tmp_path), video_file, 'stub.pt', {'inference_size': 640})
+    assert cache.frame_count == 5 and cache.complete
+    for frame, value in ((0, 1), (1, 2), (4, 4)):
+        np.testing.assert_array_equal(cache.read(frame), detections(value))
+
+    # Other settings use another cache
+    assert DetectionCache(str(tmp_path), video_file, 'stub.pt', {'inference_size': 320}).frame_count == 0
+
+
+def write_static_video(path, frames=20, size=(320, 240)):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, size)
+    frame = np.full((size[1], size[0], 3), 90, np.uint8)
+    for _ in range(frames):
+        writer.write(frame)
+    writer.release()
+
+
+class TrackCounter(Object_tracker.FrameSink):
+    needs_frames = False
+
+    def __init__(self):
+        self.counts = []
+
+    def write(self, frame_index, annotated_frame, tracks):
+        self.counts.append(len(tracks))
+
+
+def test_replay_matches_motion_gated_run(tmp_path):
+    video = str(tmp_path / 'static.mp4')
+    write_static_video(video)
+    model = StubYOLO()
+    tracker = Object_tracker.ObjectDetectionTracker(model=model, model_name='stub.pt', motion_gate=MotionGate())
+    live = TrackCounter()
+    tracker.run_video(video, headless=True, sinks=[live], cache_dir=str(tmp_path / 'cache'))
+    assert model.calls == 1 and live.counts[-1] == 1
+
+    cache = DetectionCache(str(tmp_path / 'cache'), video, 'stub.pt', tracker._detection_settings())
+    assert cache.complete
+    assert [len(tracks) for _, tracks in replay_detections(cache)] == live.counts
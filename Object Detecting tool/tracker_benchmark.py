@@ -0,0 +1,335 @@
+"""
+Benchmarks for the SimpleSORT tracker and the full detection pipeline
+Run: python tracker_benchmark.py [assignment|tracker|video] --help
+
+- assignment: IoU matrix and greedy vs. Hungarian matching at 10/100/1000 boxes
+- tracker:    SimpleSORT alone on synthetic scenes with known ground truth
+- video:      YOLO + tracker end to end over a video (Test video.mp4 by default)
+
+Every run reports frames/sec, per-frame latency, peak memory and CLEAR-MOT
+identity metrics (misses, false positives, ID switches, MOTA).
+"""
+
+import argparse
+import multiprocessing
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from Object_tracker import (ASSIGNMENT_METHODS, ObjectDetectionTracker, SimpleSORT,
+                            iou_batch, linear_sum_assignment)
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def random_boxes(rng, count, frame_size=(1920, 1080), max_size=120):
+    """Generate random [x1, y1, x2, y2] boxes inside a frame"""
+    width, height = frame_size
+    wh = rng.uniform(10, max_size, (count, 2))
+    xy = rng.uniform(0, 1, (count, 2)) * (np.array([width, height]) - wh)
+    return np.hstack([xy, xy + wh]).astype(np.float32)
+
+
+def time_call(fn, *args, repeat=5):
+    """Return the best wall time of fn(*args) in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_assignment(sizes=(10, 100, 1000), iou_threshold=0.3, seed=0):
+    """Compare greedy and Hungarian matching on jittered copies of random boxes"""
+    rng = np.random.default_rng(seed)
+    print(f"{'boxes':>6} | {'iou matrix':>11} | " +
+          " | ".join(f"{name:>10}" for name in ASSIGNMENT_METHODS))
+    print("-" * (24 + 13 * len(ASSIGNMENT_METHODS)))
+
+    for size in sizes:
+        tracks = random_boxes(rng, size)
+        detections = tracks + rng.normal(0, 3, tracks.shape).astype(np.float32)
+        iou_ms = time_call(iou_batch, detections, tracks)
+        iou_matrix = iou_batch(detections, tracks)
+
+        timings = []
+        for name, method in ASSIGNMENT_METHODS.items():
+            try:
+                timings.append(f"{time_call(method, iou_matrix, iou_threshold):8.2f}ms")
+            except ImportError:
+                timings.append(f"{'n/a':>10}")
+        print(f"{size:>6} | {iou_ms:9.2f}ms | " + " | ".join(timings))
+
+
+class SyntheticScene:
+    """
+    Boxes moving at constant velocity and bouncing off the frame edges
+
+    Ground truth is exact; detections add position noise, random misses and
+    false positives, and come in shuffled order like a real detector.
+    """
+    def __init__(self, num_objects=50, num_frames=500, frame_size=(1920, 1080),
+                 max_speed=8.0, noise=2.0, miss_rate=0.05, false_positives=1.0, seed=0):
+        self.num_objects = num_objects
+        self.num_frames = num_frames
+        self.frame_size = np.array(frame_size, dtype=np.float32)
+        self.noise = noise
+        self.miss_rate = miss_rate
+        self.false_positives = false_positives
+        self.rng = np.random.default_rng(seed)
+        self.max_speed = max_speed
+
+    def frames(self):
+        """Yield (gt_ids, gt_boxes, detections) for every frame"""
+        rng = self.rng
+        size = rng.uniform(30, 120, (self.num_objects, 2)).astype(np.float32)
+        position = (rng.uniform(0, 1, (self.num_objects, 2)) * (self.frame_size - size)).astype(np.float32)
+        velocity = rng.uniform(-self.max_speed, self.max_speed, (self.num_objects, 2)).astype(np.float32)
+        gt_ids = np.arange(self.num_objects)
+
+        for _ in range(self.num_frames):
+            position += velocity
+            # Bounce off the edges
+            low, high = position < 0, position + size > self.frame_size
+            velocity[low | high] *= -1
+            position = np.clip(position, 0, self.frame_size - size)
+            gt_boxes = np.hstack([position, position + size])
+
+            visible = rng.uniform(size=self.num_objects) >= self.miss_rate
+            boxes = gt_boxes[visible] + rng.normal(0, self.noise, (visible.sum(), 4))
+            clutter = random_boxes(rng, rng.poisson(self.false_positives), tuple(self.frame_size))
+            boxes = np.vstack([boxes, clutter])
+            confidences = rng.uniform(0.5, 1.0, (len(boxes), 1))
+            detections = np.hstack([boxes, confidences, np.zeros((len(boxes), 1))]).astype(np.float32)
+            yield gt_ids, gt_boxes.copy(), detections[rng.permutation(len(detections))]
+
+
+class MOTAccumulator:
+    """
+    CLEAR-MOT counts between ground truth and tracker output
+
+    Ground truth objects keep their previous hypothesis while the IoU stays
+    above the threshold; the rest are matched by assignment. A ground-truth
+    object matched to a different hypothesis than last time is an ID switch.
+    """
+    def __init__(self, iou_threshold=0.5):
+        self.iou_threshold = iou_threshold
+        self.assign = ASSIGNMENT_METHODS['hungarian' if linear_sum_assignment else 'greedy']
+        self.mapping = {}
+        self.num_gt = 0
+        self.matches = 0
+        self.misses = 0
+        self.false_positives = 0
+        self.id_switches = 0
+        self.iou_sum = 0.0
+
+    def update(self, gt_ids, gt_boxes, hyp_ids, hyp_boxes):
+        """Add one frame"""
+        gt_ids, hyp_ids = list(gt_ids), list(hyp_ids)
+        iou = iou_batch(gt_boxes, hyp_boxes)
+        hyp_index = {h: i for i, h in enumerate(hyp_ids)}
+        matched = []
+
+        # Keep correspondences from earlier frames while they still overlap
+        for g, gt_id in enumerate(gt_ids):
+            h = hyp_index.get(self.mapping.get(gt_id))
+            if h is not None and iou[g, h] >= self.iou_threshold:
+                matched.append((g, h))
+        masked = iou.copy()
+        for g, h in matched:
+            masked[g, :] = 0
+            masked[:, h] = 0
+
+        for g, h in self.assign(masked, self.iou_threshold):
+            previous = self.mapping.get(gt_ids[g])
+            if previous is not None and previous != hyp_ids[h]:
+                self.id_switches += 1
+            self.mapping[gt_ids[g]] = hyp_ids[h]
+            matched.append((g, h))
+
+        self.num_gt += len(gt_ids)
+        self.matches += len(matched)
+        self.misses += len(gt_ids) - len(matched)
+        self.false_positives += len(hyp_ids) - len(matched)
+        self.iou_sum += sum(iou[g, h] for g, h in matched)
+
+    def summary(self):
+        """MOTA, MOTP (mean IoU of matches) and raw counts"""
+        errors = self.misses + self.false_positives + self.id_switches
+        return {
+            'mota': 1 - errors / self.num_gt if self.num_gt else 0.0,
+            'motp': self.iou_sum / self.matches if self.matches else 0.0,
+            'gt': self.num_gt,
+            'misses': self.misses,
+            'false_positives': self.false_positives,
+            'id_switches': self.id_switches,
+        }
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, where the OS reports it"""
+    if resource is None:
+        return None
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def print_result(name, latencies, peak_mb, metrics=None):
+    """Print throughput, latency, memory and identity metrics for one run"""
+    latencies = np.array(latencies) * 1000
+    fps = len(latencies) / (latencies.sum() / 1000) if latencies.sum() > 0 else 0.0
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{name}")
+    print(f"  {fps:9.1f} fps | latency p50 {p50:.3f} ms, p95 {p95:.3f} ms, p99 {p99:.3f} ms "
+          f"| peak memory {peak_mb:.1f} MB")
+    if metrics:
+        print(f"  MOTA {metrics['mota']:.3f} | MOTP {metrics['motp']:.3f} | "
+              f"GT {metrics['gt']} | misses {metrics['misses']} | "
+              f"false positives {metrics['false_positives']} | "
+              f"ID switches {metrics['id_switches']}")
+
+
+def bench_tracker(object_counts=(10, 100, 500), num_frames=500, seed=0, **tracker_params):
+    """Run SimpleSORT directly on synthetic scenes of increasing size"""
+    for num_objects in object_counts:
+        scene = SyntheticScene(num_objects, num_frames, seed=seed)
+        frames = list(scene.frames())
+
+        # Timing pass
+        tracker = SimpleSORT(**tracker_params)
+        accumulator = MOTAccumulator()
+        latencies = []
+        for gt_ids, gt_boxes, detections in frames:
+            start = time.perf_counter()
+            tracks = tracker.update(detections)
+            latencies.append(time.perf_counter() - start)
+            accumulator.update(gt_ids, gt_boxes, tracks.ids, tracks.bboxes)
+
+        # Memory pass (tracemalloc slows the tracker down, so it is timed separately)
+        tracemalloc.start()
+        tracker = SimpleSORT(**tracker_params)
+        for _, _, detections in frames:
+            tracker.update(detections)
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+        print_result(f"SimpleSORT: {num_objects} objects x {num_frames} frames",
+                     latencies, peak_mb, accumulator.summary())
+
+
+def run_video_tracks(source, max_frames=None, **tracker_kwargs):
+    """
+    Run the detector and tracker over a video headlessly
+
+    Returns:
+        (per-frame latencies, per-frame (ids, bboxes) tuples)
+    """
+    import cv2
+
+    tracker = ObjectDetectionTracker(**tracker_kwargs)
+    cap = cv2.VideoCapture(source)
+    latencies, outputs = [], []
+    try:
+        while max_frames is None or len(outputs) < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            start = time.perf_counter()
+            tracks = tracker.track(frame)
+            latencies.append(time.perf_counter() - start)
+            outputs.append((tracks.ids.copy(), tracks.bboxes.copy()))
+    finally:
+        cap.release()
+    return latencies, outputs
+
+
+def video_peak_memory(source, max_frames, tracker_kwargs):
+    """
+    Peak memory in MB of one headless video run (called in a fresh process)
+
+    Uses the process peak RSS where available, which includes the model and
+    decoder; otherwise Python allocations traced by tracemalloc.
+    """
+    if resource is None:
+        tracemalloc.start()
+        run_video_tracks(source, max_frames, **tracker_kwargs)
+        peak_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+        return peak_mb
+    run_video_tracks(source, max_frames, **tracker_kwargs)
+    return peak_rss_mb()
+
+
+def bench_video(source='Test video.mp4', model_name='yolov8n.pt', detect_intervals=(1, 3, 5),
+                max_frames=None):
+    """
+    End-to-end throughput over a real video
+
+    The video has no ground truth, so the tracks from the first
+    configuration (detector on every frame by default) serve as the
+    reference for the identity metrics of the others.
+
+    Latencies are timed without tracemalloc. Memory is measured in a
+    separate pass, in a new process per configuration, so each peak belongs
+    to that configuration alone and not to the runs before it.
+    """
+    reference = None
+    context = multiprocessing.get_context('spawn')
+    for interval in detect_intervals:
+        tracker_kwargs = {'model_name': model_name, 'detect_interval': interval}
+        latencies, outputs = run_video_tracks(source, max_frames, **tracker_kwargs)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            peak_mb = pool.submit(video_peak_memory, source, max_frames, tracker_kwargs).result()
+
+        metrics = None
+        if reference is None:
+            reference = outputs
+        else:
+            accumulator = MOTAccumulator()
+            for (gt_ids, gt_boxes), (ids, bboxes) in zip(reference, outputs):
+                accumulator.update(gt_ids, gt_boxes, ids, bboxes)
+            metrics = accumulator.summary()
+
+        name = f"{source}: detect_interval={interval}"
+        if metrics is None:
+            name += " (reference)"
+        print_result(name, latencies, peak_mb, metrics)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SimpleSORT and pipeline benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    assignment = commands.add_parser('assignment', help="IoU matrix and matching micro-benchmark")
+    assignment.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+
+    tracker = commands.add_parser('tracker', help="SimpleSORT on synthetic scenes")
+    tracker.add_argument('--objects', type=int, nargs='+', default=[10, 100, 500])
+    tracker.add_argument('--frames', type=int, default=500)
+    tracker.add_argument('--assignment', choices=list(ASSIGNMENT_METHODS), default='greedy')
+    tracker.add_argument('--motion-model', choices=['kalman', 'none'], default='kalman')
+    tracker.add_argument('--seed', type=int, default=0)
+
+    video = commands.add_parser('video', help="YOLO + tracker over a video")
+    video.add_argument('--source', default='Test video.mp4')
+    video.add_argument('--model', default='yolov8n.pt')
+    video.add_argument('--detect-intervals', type=int, nargs='+', default=[1, 3, 5])
+    video.add_argument('--max-frames', type=int, default=None)
+
+    args = parser.parse_args()
+    if args.command == 'assignment':
+        bench_assignment(args.sizes)
+    elif args.command == 'tracker':
+        bench_tracker(args.objects, args.frames, args.seed, assignment=args.assignment,
+                      motion_model=None if args.motion_model == 'none' else 'kalman')
+    else:
+        bench_video(args.source, args.model, args.detect_intervals, args.max_frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,70 +3,25 @@ PolyGlot - Advanced Language Translation with Text-to-Speech
 Run: streamlit run polyglot.py
 """
 
+import csv
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from io import BytesIO, StringIO
+
 import streamlit as st
 from gtts import gTTS
 from deep_translator import GoogleTranslator
-from io import BytesIO
-from datetime import datetime
-
-# ---------------- PAGE CONFIG ---------------- #
-st.set_page_config(
-    page_title="PolyGlot Translator",
-    layout="wide",
-    page_icon="🌐"
-)
-
-# ---------------- CUSTOM CSS ---------------- #
-st.markdown("""
-<style>
-body {
-    background: linear-gradient(135deg, #0f2027, #203a43, #2c5364);
-}
-
-.main {
-    background-color: transparent;
-}
-
-h1, h2, h3 {
-    color: #ffffff;
-}
-
-p {
-    color: #cccccc;
-}
-
-.card {
-    background: rgba(255,255,255,0.05);
-    border-radius: 16px;
-    padding: 20px;
-    box-shadow: 0px 0px 15px rgba(0,0,0,0.4);
-}
-
-textarea {
-    background-color: #1e1e1e !important;
-    color: white !important;
-    border-radius: 10px !important;
-}
-
-select {
-    background-color: #1e1e1e !important;
-    color: white !important;
-}
-
-button {
-    border-radius: 12px !important;
-    font-weight: bold !important;
-}
-
-hr {
-    border-color: #444;
-}
-
-footer {
-    visibility: hidden;
-}
-</style>
-""", unsafe_allow_html=True)
 
 # ---------------- LANGUAGES ---------------- #
 LANGUAGES = {
@@ -100,78 +55,1049 @@ LANGUAGES = {
     'yo': 'Yoruba', 'zu': 'Zulu'
 }
 
+# ---------------- TRANSLATION CACHE ---------------- #
+CACHE_DIR = os.environ.get(
+    "POLYGLOT_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "polyglot")
+)
+
+
+def normalize_text(text):
+    """Canonical form of a text for cache keys (NFC, trimmed, single spaces)"""
+    text = unicodedata.normalize("NFC", text).replace("\r\n", "\n").strip()
+    return "\n".join(" ".join(line.split()) for line in text.split("\n"))
+
+
+class TranslationCache:
+    """
+    Two-level translation cache: in-process LRU in front of SQLite
+
+    Entries are keyed by normalized text + language pair (+ backend
+    namespace, so engines never serve each other's output). Both levels expire
+    entries after `ttl` seconds; the LRU holds at most `memory_size` entries
+    and the SQLite table at most `max_rows` (least recently used go first).
+    Safe to share between Streamlit sessions.
+
+    The row count is read once when the cache is opened and then kept up to
+    date, so a put only touches indexed rows instead of scanning the table.
+    """
+
+    def __init__(self, path=None, memory_size=512, max_rows=50000, ttl=30 * 24 * 3600):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "translations.sqlite3")
+        self.memory_size = memory_size
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON translations (last_used)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_created ON translations (created)")
+        self.db.commit()
+        self.rows = self.db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    @staticmethod
+    def key(text, source_lang, target_lang, namespace=""):
+        raw = f"{source_lang}\x1f{target_lang}\x1f{normalize_text(text)}"
+        if namespace:
+            raw = f"{namespace}\x1f{raw}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text, source_lang, target_lang, namespace=""):
+        key = self.key(text, source_lang, target_lang, namespace)
+        now = time.time()
+        with self.lock:
+            entry = self.memory.get(key)
+            if entry is not None and now - entry[1] < self.ttl:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0]
+
+            row = self.db.execute(
+                "SELECT translation, created FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and now - row[1] < self.ttl:
+                self.db.execute("UPDATE translations SET last_used = ? WHERE key = ?", (now, key))
+                self.db.commit()
+                self._remember(key, row[0], row[1])
+                self.stats["disk_hits"] += 1
+                return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, text, source_lang, target_lang, translation, namespace=""):
+        key = self.key(text, source_lang, target_lang, namespace)
+        now = time.time()
+        with self.lock:
+            self._remember(key, translation, now)
+            exists = self.db.execute("SELECT 1 FROM translations WHERE key = ?", (key,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?)",
+                (key, translation, now, now)
+            )
+            if exists is None:
+                self.rows += 1
+            self._evict(now)
+            self.db.commit()
+
+    def _remember(self, key, translation, created):
+        self.memory[key] = (translation, created)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def _evict(self, now):
+        # Both deletes walk an index and stop at the first row they keep
+        self.rows -= self.db.execute("DELETE FROM translations WHERE created < ?", (now - self.ttl,)).rowcount
+        if self.rows > self.max_rows:
+            self.rows -= self.db.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY last_used LIMIT ?)",
+                (self.rows - self.max_rows,)
+            ).rowcount
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.db.execute("DELETE FROM translations")
+            self.db.commit()
+            self.rows = 0
+
+
+@st.cache_resource
+def get_translation_cache():
+    return TranslationCache()
+
+
+# ---------------- AUDIO CACHE ---------------- #
+CHUNK_CHARS = 300
+SENTENCE_END = re.compile(r"(?<=[.!?;:\u3002\uff01\uff1f\u0964])\s+|\n+")
+
+
+def split_sentences(text, max_chars=CHUNK_CHARS):
+    """
+    Split text into speech chunks at sentence boundaries
+
+    Consecutive short sentences are merged up to `max_chars`; a single
+    sentence longer than that is broken at the last space that fits.
+    """
+    chunks = []
+    current = ""
+    for sentence in SENTENCE_END.split(text.strip()):
+        sentence = sentence.strip()
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if not sentence:
+            continue
+        if current and len(current) + 1 + len(sentence) > max_chars:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks or [text]
+
+
+class AudioCache:
+    """
+    Content-addressed MP3 cache on disk
+
+    Files are named by a hash of language + normalized text. When the
+    directory grows past `max_bytes`, the least recently played files are
+    removed until it fits again.
+    """
+
+    def __init__(self, path=None, max_bytes=200 * 1024 * 1024):
+        self.path = path or os.path.join(CACHE_DIR, "audio")
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+        os.makedirs(self.path, exist_ok=True)
+
+    def file_for(self, text, lang, namespace=""):
+        raw = f"{lang.lower()}\x1f{normalize_text(text)}"
+        if namespace:
+            raw = f"{namespace}\x1f{raw}"
+        name = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, f"{name}.mp3")
+
+    def get(self, text, lang, namespace=""):
+        path = self.file_for(text, lang, namespace)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self.lock:
+                self.stats["misses"] += 1
+            return None
+        with self.lock:
+            self.stats["hits"] += 1
+        return data
+
+    def put(self, text, lang, data, namespace=""):
+        path = self.file_for(text, lang, namespace)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self.lock:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(".mp3"):
+                info = entry.stat()
+                entries.append((info.st_mtime, info.st_size, entry.path))
+                total += info.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+@st.cache_resource
+def get_audio_cache():
+    return AudioCache()
+
+
+# ---------------- BACKENDS ---------------- #
+DEFAULT_BACKEND = os.environ.get("POLYGLOT_BACKEND", "google")
+DEFAULT_RATE_LIMIT = float(os.environ.get("POLYGLOT_RATE_LIMIT", 5.0))  # requests per second to one backend host
+PHRASEBOOK_DIR = os.environ.get("POLYGLOT_PHRASEBOOK_DIR", os.path.join(CACHE_DIR, "phrasebooks"))
+
+
+class TranslationBackend:
+    """
+    Interface every translation engine implements
+
+    translator(source=..., target=...) returns an object with
+    translate(text), the same shape as deep_translator's classes, so a
+    backend can be passed anywhere a translator_factory is accepted.
+    Backends that can speak set `supports_speech` and implement
+    speaker(text=..., lang=...) returning an object with write_to_fp(fp).
+    """
+
+    name = ""
+    label = ""
+    host = None  # requests to the same host share one rate limiter
+    offline = False
+    supports_speech = False
+    cache_namespace = ""
+
+    def translator(self, source, target):
+        raise NotImplementedError
+
+    def speaker(self, text, lang):
+        raise NotImplementedError
+
+
+class GoogleBackend(TranslationBackend):
+    """Google Translate via deep_translator, speech via gTTS (needs internet)"""
+
+    name = "google"
+    label = "Google Translate (online)"
+    host = "translate.google.com"
+    supports_speech = True
+    cache_namespace = ""  # keep entries cached before backends existed
+
+    def translator(self, source, target):
+        return GoogleTranslator(source=source, target=target)
+
+    def speaker(self, text, lang):
+        return gTTS(text=text, lang=lang)
+
+
+BUILTIN_PHRASEBOOK = {
+    ("en", "es"): {
+        "hello": "hola", "good morning": "buenos días", "good night": "buenas noches",
+        "thank you": "gracias", "please": "por favor", "yes": "sí", "no": "no",
+        "how are you": "cómo estás", "goodbye": "adiós", "where is": "dónde está",
+        "the bathroom": "el baño", "water": "agua", "friend": "amigo", "i love you": "te quiero",
+    },
+    ("en", "fr"): {
+        "hello": "bonjour", "good morning": "bonjour", "good night": "bonne nuit",
+        "thank you": "merci", "please": "s'il vous plaît", "yes": "oui", "no": "non",
+        "how are you": "comment allez-vous", "goodbye": "au revoir", "where is": "où est",
+        "the bathroom": "la salle de bain", "water": "eau", "friend": "ami", "i love you": "je t'aime",
+    },
+    ("en", "de"): {
+        "hello": "hallo", "good morning": "guten Morgen", "good night": "gute Nacht",
+        "thank you": "danke", "please": "bitte", "yes": "ja", "no": "nein",
+        "how are you": "wie geht es dir", "goodbye": "auf Wiedersehen", "where is": "wo ist",
+        "the bathroom": "das Badezimmer", "water": "Wasser", "friend": "Freund", "i love you": "ich liebe dich",
+    },
+}
+TOKEN = re.compile(r"\w+(?:'\w+)?|\s+|[^\w\s]", re.UNICODE)
+
+
+class PhrasebookTranslator:
+    """Greedy longest-match phrase substitution for one language pair"""
+
+    def __init__(self, backend, source, target):
+        self.backend = backend
+        self.source = source
+        self.target = target
+
+    def translate(self, text):
+        source = self.source
+        if source == "auto":
+            source = self.backend.detect(text, self.target)
+        table = self.backend.tables.get((source, self.target))
+        if table is None:
+            raise ValueError(f"No offline phrasebook for {source} → {self.target}")
+        return self.backend.substitute(text, table)
+
+
+def language_pair(stem):
+    """
+    (source, target) codes from a phrasebook file name such as "en-fr" or "zh-CN-en"
+
+    Codes can contain hyphens themselves, so the name is split where both
+    halves are LANGUAGES codes (matched case-insensitively). Names with a
+    single hyphen are split there even if the codes are unknown; anything
+    else gives None.
+    """
+    codes = {code.lower(): code for code in LANGUAGES}
+    parts = stem.split("-")
+    for i in range(1, len(parts)):
+        source, target = "-".join(parts[:i]).lower(), "-".join(parts[i:]).lower()
+        if source in codes and target in codes:
+            return codes[source], codes[target]
+    if len(parts) == 2 and all(parts):
+        return parts[0], parts[1]
+    return None
+
+
+class PhrasebookBackend(TranslationBackend):
+    """
+    Offline dictionary/phrase-table engine
+
+    Loads the built-in phrasebook plus any `<src>-<tgt>.tsv` files
+    (source<TAB>target per line, e.g. zh-CN-en.tsv) from PHRASEBOOK_DIR,
+    and derives the reverse direction of every pair. Phrases are matched
+    longest first, case-insensitively; unknown words pass through unchanged.
+    """
+
+    name = "phrasebook"
+    label = "Offline phrasebook"
+    offline = True
+    cache_namespace = "phrasebook"
+
+    def __init__(self, directory=PHRASEBOOK_DIR):
+        self.tables = {}
+        for pair, phrases in BUILTIN_PHRASEBOOK.items():
+            self.add(pair, phrases)
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                stem, ext = os.path.splitext(name)
+                pair = language_pair(stem) if ext == ".tsv" else None
+                if pair is None:
+                    continue
+                with open(os.path.join(directory, name), encoding="utf-8") as f:
+                    rows = [line.rstrip("\n").split("\t") for line in f]
+                self.add(pair, {r[0]: r[1] for r in rows if len(r) >= 2})
+        self.max_words = max(
+            (len(p.split()) for table in self.tables.values() for p in table), default=1
+        )
+
+    def add(self, pair, phrases):
+        source, target = pair
+        forward = self.tables.setdefault((source, target), {})
+        reverse = self.tables.setdefault((target, source), {})
+        for phrase, translation in phrases.items():
+            forward[normalize_text(phrase).lower()] = translation
+            reverse.setdefault(normalize_text(translation).lower(), phrase)
+
+    def translator(self, source, target):
+        return PhrasebookTranslator(self, source, target)
+
+    def detect(self, text, target):
+        """Pick the source language whose phrasebook covers the most words"""
+        words = [t.lower() for t in TOKEN.findall(text) if t[0].isalnum()]
+        best, best_score = None, -1
+        for (source, tgt), table in self.tables.items():
+            if tgt != target:
+                continue
+            score = sum(word in table for word in words)
+            if score > best_score:
+                best, best_score = source, score
+        if best is None:
+            raise ValueError(f"No offline phrasebook into {target}")
+        return best
+
+    def substitute(self, text, table):
+        tokens = TOKEN.findall(text)
+        words = [i for i, t in enumerate(tokens) if t[0].isalnum() or t[0] == "_"]
+        out = []
+        position = 0
+        w = 0
+        while w < len(words):
+            for n in range(min(self.max_words, len(words) - w), 0, -1):
+                span = words[w:w + n]
+                # a phrase may only span words separated by whitespace
+                if any(not tokens[i].isspace() for i in range(span[0] + 1, span[-1]) if i not in span):
+                    continue
+                phrase = " ".join(tokens[i].lower() for i in span)
+                translation = table.get(phrase)
+                if translation is not None:
+                    if tokens[span[0]][0].isupper():
+                        translation = translation[:1].upper() + translation[1:]
+                    out.extend(tokens[position:span[0]])
+                    out.append(translation)
+                    position = span[-1] + 1
+                    w += n
+                    break
+            else:
+                w += 1
+        out.extend(tokens[position:])
+        return "".join(out)
+
+
+BACKENDS = {backend.name: backend for backend in (GoogleBackend, PhrasebookBackend)}
+
+
+@st.cache_resource
+def get_backend(name=None):
+    """Shared, warm instance of a backend (phrasebooks load once per process)"""
+    name = name or DEFAULT_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+def resolve_backend(backend):
+    return backend if isinstance(backend, TranslationBackend) else get_backend(backend)
+
+
+def speech_factory(backend=None):
+    """(tts_factory, cache namespace) for a backend, falling back to gTTS"""
+    backend = resolve_backend(backend)
+    if backend.supports_speech:
+        return backend.speaker, backend.cache_namespace
+    return gTTS, ""
+
+
 # ---------------- FUNCTIONS ---------------- #
-def translate_text(text, source_lang, target_lang):
+def translate_text(text, source_lang, target_lang, cache=None, translator_factory=None, backend=None,
+                   rate_limit=None):
+    # translator_factory(source=..., target=...) lets tests plug in a local stub
+    backend = resolve_backend(backend)
+    limiter = backend_limiter(backend, rate_limit, translator_factory)
+    translator_factory = translator_factory or backend.translator
+    cache = cache or get_translation_cache()
+    cached = cache.get(text, source_lang, target_lang, backend.cache_namespace)
+    if cached is not None:
+        return cached, None
+    limiter.wait()
     try:
-        translator = GoogleTranslator(source=source_lang, target=target_lang)
-        return translator.translate(text), None
+        translator = translator_factory(source=source_lang, target=target_lang)
+        translated = translator.translate(text)
     except Exception as e:
         return None, str(e)
+    if translated:
+        cache.put(text, source_lang, target_lang, translated, backend.cache_namespace)
+    return translated, None
+
+def synthesize(text, lang, cache=None, tts_factory=gTTS, namespace=""):
+    """MP3 bytes for `text`, served from the audio cache when possible"""
+    cache = cache or get_audio_cache()
+    data = cache.get(text, lang, namespace)
+    if data is None:
+        tts = tts_factory(text=text, lang=lang.lower())
+        buffer = BytesIO()
+        tts.write_to_fp(buffer)
+        data = buffer.getvalue()
+        cache.put(text, lang, data, namespace)
+    return data
 
-def text_to_speech(text, lang):
+def text_to_speech(text, lang, cache=None, tts_factory=None, backend=None):
+    namespace = ""
+    if tts_factory is None:
+        tts_factory, namespace = speech_factory(backend)
     try:
-        tts = gTTS(text=text, lang=lang.lower())
-        audio = BytesIO()
-        tts.write_to_fp(audio)
-        audio.seek(0)
-        return audio, None
+        return BytesIO(synthesize(text, lang, cache, tts_factory, namespace)), None
     except Exception as e:
         return None, str(e)
 
-# ---------------- SESSION STATE ---------------- #
-if "trans_result" not in st.session_state:
-    st.session_state.trans_result = ""
-if "history" not in st.session_state:
-    st.session_state.history = []
-
-# ---------------- HEADER ---------------- #
-st.markdown("""
-<h1 style='text-align:center;'>🌐 PolyGlot Translator</h1>
-<p style='text-align:center;'>Translate and listen in multiple languages</p>
-<hr>
-""", unsafe_allow_html=True)
-
-# ---------------- MAIN LAYOUT ---------------- #
-col1, col2 = st.columns(2)
-
-with col1:
-    st.markdown("<div class='card'>", unsafe_allow_html=True)
-    st.markdown("### 📝 Input")
-
-    source_lang = st.selectbox(
-        "Choose Input language",
-        ["auto"] + list(LANGUAGES.keys()),
-        format_func=lambda x: "Auto Detect" if x == "auto" else LANGUAGES[x]
-    )
+def stream_speech(text, lang, cache=None, tts_factory=None, max_chars=CHUNK_CHARS, workers=4, backend=None):
+    """
+    Synthesize sentence chunks concurrently and yield them in order
 
-    source_text = st.text_area(
-        "Enter Text",
-        placeholder="Type or paste text here...",
-        height=200
-    )
+    Yields (audio, error) per chunk as soon as that chunk (and every chunk
+    before it) is ready, so playback can start before the tail is done.
+    """
+    cache = cache or get_audio_cache()
+    namespace = ""
+    if tts_factory is None:
+        tts_factory, namespace = speech_factory(backend)
+    chunks = split_sentences(text, max_chars)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as pool:
+        futures = [pool.submit(synthesize, chunk, lang, cache, tts_factory, namespace) for chunk in chunks]
+        for future in futures:
+            try:
+                yield BytesIO(future.result()), None
+            except Exception as e:
+                for pending in futures:
+                    pending.cancel()
+                yield None, str(e)
+                return
 
-    if st.button("🔊 Listen", use_container_width=True):
-        if source_lang == "auto":
-            st.warning("Select a language for speech.")
+def play_speech(text, lang, chunked=False, backend=None):
+    if not chunked or len(split_sentences(text)) == 1:
+        audio, err = text_to_speech(text, lang, backend=backend)
+        if audio:
+            st.audio(audio)
         else:
-            audio, err = text_to_speech(source_text, source_lang)
-            if audio:
-                st.audio(audio)
+            st.error(err)
+        return
+    for index, (audio, err) in enumerate(stream_speech(text, lang, backend=backend), 1):
+        if audio is None:
+            st.error(err)
+            return
+        st.caption(f"Part {index}")
+        st.audio(audio, autoplay=index == 1)
+
+# ---------------- BATCH TRANSLATION ---------------- #
+PROVIDER_CHAR_LIMIT = 4500  # Google rejects requests over 5000 characters
+PARAGRAPH_BREAK = re.compile(r"(\n\s*\n)")
+
+
+def split_with_separators(text, limit):
+    """
+    Split text into pieces of at most `limit` characters, keeping separators
+
+    Pieces end at sentence boundaries or line breaks where possible, and at
+    a space (or mid-word as a last resort) inside over-long sentences.
+
+    Returns:
+        List of (piece, separator) where separator is the exact text that
+        followed the piece, so "".join(p + s for p, s in pieces) == text
+    """
+    parts = re.split(f"({SENTENCE_END.pattern})", text) + [""]
+    # Whitespace around a sentence (e.g. "\r" before "\n") belongs to the separators
+    for i in range(0, len(parts) - 1, 2):
+        sentence = parts[i].rstrip()
+        parts[i + 1] = parts[i][len(sentence):] + parts[i + 1]
+        stripped = sentence.lstrip()
+        if i and stripped != sentence:
+            parts[i - 1] += sentence[:len(sentence) - len(stripped)]
+            sentence = stripped
+        parts[i] = sentence
+    units = []
+    for i in range(0, len(parts) - 1, 2):
+        sentence, separator = parts[i], parts[i + 1]
+        while len(sentence) > limit:
+            cut = sentence.rfind(" ", 1, limit + 1)
+            head = sentence[:cut].rstrip()
+            if cut > 0 and head:
+                rest = sentence[cut:].lstrip()
+                units.append((head, sentence[len(head):len(sentence) - len(rest)]))
+                sentence = rest
             else:
-                st.error(err)
+                units.append((sentence[:limit], ""))
+                sentence = sentence[limit:]
+        units.append((sentence, separator))
+
+    pieces = []
+    current, current_separator = "", ""
+    for sentence, separator in units:
+        if not sentence:
+            current_separator += separator
+        elif current and len(current) + len(current_separator) + len(sentence) <= limit:
+            current += current_separator + sentence
+            current_separator = separator
+        else:
+            if current:
+                pieces.append((current, current_separator))
+            current, current_separator = sentence, separator
+    if current:
+        pieces.append((current, current_separator))
+    return pieces
 
-    st.markdown("</div>", unsafe_allow_html=True)
 
-with col2:
-    st.markdown("<div class='card'>", unsafe_allow_html=True)
-    st.markdown("### 🌍 Translation")
+def segment_document(text, limit=PROVIDER_CHAR_LIMIT):
+    """
+    Split a document into translatable segments
 
-    target_lang = st.selectbox(
-        "Choose Translation language",
-        list(LANGUAGES.keys()),
-        format_func=lambda x: LANGUAGES[x]
-    )
+    Args:
+        text: Document text
+        limit: Maximum characters per segment
+
+    Returns:
+        (segments, layout) where layout is a list of literal strings and
+        segment indices; see reassemble().
+    """
+    segments = []
+    layout = []
+    for part in PARAGRAPH_BREAK.split(text):
+        body = part.strip()
+        if not body:
+            layout.append(part)
+            continue
+        start = part.index(body)
+        if start:
+            layout.append(part[:start])
+        pieces = [(body, "")] if len(body) <= limit else split_with_separators(body, limit)
+        for piece, separator in pieces:
+            layout.append(len(segments))
+            segments.append(piece)
+            if separator:
+                layout.append(separator)
+        if part[start + len(body):]:
+            layout.append(part[start + len(body):])
+    return segments, layout
+
+
+def reassemble(layout, translations):
+    return "".join(translations[x] if isinstance(x, int) else x for x in layout)
+
+
+class RateLimiter:
+    """Spaces out calls so at most `rate` start per second (shared across threads)"""
 
+    def __init__(self, rate):
+        self.lock = threading.Lock()
+        self.next_slot = 0.0
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """Change the allowed rate; waits already scheduled are kept"""
+        with self.lock:
+            self.rate = rate
+            self.interval = 1.0 / rate if rate else 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+def host_limiter(host, rate=None):
+    """
+    Process-wide RateLimiter per upstream host (None host = no limit)
+
+    Every caller for a host shares one limiter, which starts at
+    DEFAULT_RATE_LIMIT. Only an explicit `rate` changes it (for all
+    callers, see set_host_rate); calls without one keep the host's rate.
+    """
+    if host is None:
+        return RateLimiter(None)
+    with _host_limiters_lock:
+        limiter = _host_limiters.get(host)
+        if limiter is None:
+            limiter = _host_limiters[host] = RateLimiter(DEFAULT_RATE_LIMIT)
+    if rate is not None and limiter.rate != rate:
+        limiter.set_rate(rate)
+    return limiter
+
+
+def set_host_rate(host, rate):
+    """Set the requests per second allowed to `host` for every caller"""
+    host_limiter(host, rate)
+
+
+def backend_limiter(backend, rate, translator_factory=None):
+    """The host limiter for calls to `backend`; a custom translator_factory never reaches its host"""
+    return host_limiter(backend.host if translator_factory is None else None, rate)
+
+
+class BatchTranslator:
+    """
+    Translate many segments through a bounded worker pool
+
+    Segments are deduplicated by normalized text and checked against the
+    translation cache first; only the remaining unique segments are sent
+    upstream, rate limited and retried with exponential backoff. Results
+    always come back in input order. Segments that still fail after all
+    retries keep their source text and are listed in `errors`.
+    """
+
+    def __init__(self, source_lang, target_lang, cache=None, translator_factory=None, backend=None,
+                 workers=4, rate_limit=None, retries=3, backoff=0.5, limit=PROVIDER_CHAR_LIMIT, limiter=None):
+        backend = resolve_backend(backend)
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.cache = cache or get_translation_cache()
+        self.translator_factory = translator_factory or backend.translator
+        self.namespace = backend.cache_namespace
+        self.workers = workers
+        self.limiter = limiter or backend_limiter(backend, rate_limit, translator_factory)
+        self.retries = retries
+        self.backoff = backoff
+        self.limit = limit
+        self.errors = []
+        self.local = threading.local()
+
+    def _translate_one(self, text):
+        translator = getattr(self.local, "translator", None)
+        if translator is None:
+            translator = self.translator_factory(source=self.source_lang, target=self.target_lang)
+            self.local.translator = translator
+        for attempt in range(self.retries + 1):
+            self.limiter.wait()
+            try:
+                translated = translator.translate(text)
+                if translated is None:
+                    raise RuntimeError("empty response")
+                self.cache.put(text, self.source_lang, self.target_lang, translated, self.namespace)
+                return translated
+            except ValueError:
+                raise  # unsupported pair or bad input, retrying will not help
+            except Exception:
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt * (1 + random.random()))
+
+    def translate_segments(self, segments, progress=None):
+        """
+        Translate a list of segments
+
+        Args:
+            segments: List of strings
+            progress: Optional callback(done, total) over unique segments
+
+        Returns:
+            List of translations, same length and order as `segments`
+        """
+        unique = {}
+        for text in segments:
+            unique.setdefault(normalize_text(text), text)
+        total = len(unique)
+        done = 0
+        results = {}
+        pending = []
+        for key, text in unique.items():
+            cached = self.cache.get(text, self.source_lang, self.target_lang, self.namespace)
+            if cached is None:
+                pending.append(key)
+            else:
+                results[key] = cached
+                done += 1
+        if progress:
+            progress(done, total)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(self._translate_one, unique[key]): key for key in pending}
+                for future in as_completed(futures):
+                    key = futures[future]
+                    try:
+                        results[key] = future.result()
+                    except Exception as e:
+                        results[key] = unique[key]
+                        self.errors.append((unique[key], str(e)))
+                    done += 1
+                    if progress:
+                        progress(done, total)
+
+        return [results[normalize_text(text)] for text in segments]
+
+    def translate_document(self, text, progress=None):
+        segments, layout = segment_document(text, self.limit)
+        return reassemble(layout, self.translate_segments(segments, progress))
+
+    def translate_rows(self, rows, columns, progress=None):
+        """
+        Translate selected columns of a list of row dicts
+
+        Translations are written to new `<column>_<target_lang>` columns;
+        repeated cell values across the whole table are translated once.
+        """
+        segments = []
+        layouts = []
+        for row in rows:
+            for column in columns:
+                cell_segments, layout = segment_document(str(row.get(column) or ""), self.limit)
+                offset = len(segments)
+                segments.extend(cell_segments)
+                layouts.append([x + offset if isinstance(x, int) else x for x in layout])
+        translations = self.translate_segments(segments, progress)
+        output = []
+        cells = iter(layouts)
+        for row in rows:
+            row = dict(row)
+            for column in columns:
+                row[f"{column}_{self.target_lang}"] = reassemble(next(cells), translations)
+            output.append(row)
+        return output
+
+
+def fan_out(text, source_lang, targets, backend=None, workers=6, segment_workers=2, rate_limit=None, **options):
+    """
+    Translate one text into many languages concurrently
+
+    The source is segmented once and every target reuses the segments. Up
+    to `workers` targets run at a time, each with `segment_workers` threads,
+    and all of them share the backend host's rate limiter.
+
+    Args:
+        text: Source text
+        source_lang: Source language code or "auto"
+        targets: Target language codes
+        backend: Backend name or instance (default: DEFAULT_BACKEND)
+        workers: Languages translated in parallel
+        segment_workers: Threads per language
+        rate_limit: Requests per second allowed to the backend's host
+            (None = keep the host's current rate)
+        **options: Passed to BatchTranslator (cache, translator_factory, retries, ...)
+
+    Yields:
+        (target_lang, translation, errors) as each language finishes
+    """
+    backend = resolve_backend(backend)
+    segments, layout = segment_document(text, options.get("limit", PROVIDER_CHAR_LIMIT))
+    limiter = backend_limiter(backend, rate_limit, options.get("translator_factory"))
+
+    def run(target):
+        batch = BatchTranslator(source_lang, target, backend=backend, workers=segment_workers,
+                                limiter=limiter, **options)
+        return reassemble(layout, batch.translate_segments(segments)), batch.errors
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(targets)))) as pool:
+        futures = {pool.submit(run, target): target for target in targets}
+        for future in as_completed(futures):
+            translation, errors = future.result()
+            yield futures[future], translation, errors
+
+
+def make_bundle(source_text, translations):
+    """Zip with source.txt and one <lang>.txt per translation"""
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr("source.txt", source_text)
+        for lang, translation in sorted(translations.items()):
+            bundle.writestr(f"{lang}.txt", translation)
+    return buffer.getvalue()
+
+
+def read_table(data, kind):
+    """Parse CSV or JSONL bytes into (rows, columns)"""
+    text = data.decode("utf-8-sig") if isinstance(data, bytes) else data
+    if kind == "csv":
+        reader = csv.DictReader(StringIO(text))
+        return list(reader), list(reader.fieldnames or [])
+    rows = [json.loads(line) for line in text.splitlines() if line.strip()]
+    columns = []
+    for row in rows:
+        columns.extend(k for k in row if k not in columns)
+    return rows, columns
+
+
+def write_table(rows, kind):
+    """Serialize row dicts back to CSV or JSONL text"""
+    if kind == "csv":
+        columns = []
+        for row in rows:
+            columns.extend(k for k in row if k not in columns)
+        out = StringIO()
+        writer = csv.DictWriter(out, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+        return out.getvalue()
+    return "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+
+
+def translate_file(path, source_lang, target_lang, columns=None, output=None, progress=None, **options):
+    """
+    Translate a text, CSV or JSONL file without the UI
+
+    Args:
+        path: Input file (.csv, .jsonl, anything else is plain text)
+        source_lang: Source language code or "auto"
+        target_lang: Target language code
+        columns: Columns to translate; required for CSV/JSONL, where ID,
+            number and date columns must not be sent for translation
+        output: Output path (default: <name>.<target_lang>.<ext> next to input)
+        progress: Optional callback(done, total)
+        **options: Passed to BatchTranslator (backend, workers, rate_limit, translator_factory, ...)
+
+    Returns:
+        (output path, list of (segment, error) that could not be translated)
+    """
+    root, ext = os.path.splitext(path)
+    kind = ext.lower().lstrip(".")
+    if kind in ("csv", "jsonl") and not columns:
+        raise ValueError(f"Choose the columns to translate in {path} (columns=[...])")
+    output = output or f"{root}.{target_lang}{ext}"
+    batch = BatchTranslator(source_lang, target_lang, **options)
+    with open(path, "rb") as f:
+        data = f.read()
+    if kind in ("csv", "jsonl"):
+        rows, all_columns = read_table(data, kind)
+        missing = [column for column in columns if column not in all_columns]
+        if missing:
+            raise ValueError(f"No column {', '.join(missing)} in {path}")
+        result = write_table(batch.translate_rows(rows, columns, progress), kind)
+    else:
+        result = batch.translate_document(data.decode("utf-8-sig"), progress)
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        f.write(result)
+    return output, batch.errors
+
+# ---------------- LIVE TRANSLATION ---------------- #
+class LiveTranslator:
+    """
+    Background worker for translate-as-you-type
+
+    submit() only records the newest request; the worker waits until no new
+    text has arrived for `debounce` seconds, so a burst of edits becomes a
+    single translation. A request that is superseded while it runs stops
+    before its next paragraph and its result is dropped. Paragraphs that
+    did not change since the last result are reused as-is, and the rest go
+    through translate_text (and therefore the translation cache), so only
+    edited paragraphs can reach the network. The thread exits after
+    `idle_timeout` seconds without work and restarts on the next submit.
+    """
+
+    def __init__(self, debounce=0.4, cache=None, idle_timeout=300):
+        self.debounce = debounce
+        self.cache = cache
+        self.idle_timeout = idle_timeout
+        self.condition = threading.Condition()
+        self.generation = 0
+        self.request = None
+        self.last_request = None
+        self.last_submit = 0.0
+        self.result = None
+        self.previous = {}
+        self.thread = None
+        self.stats = {"submitted": 0, "translated": 0, "cancelled": 0, "reused": 0, "requested": 0}
+
+    def submit(self, text, source_lang, target_lang, backend=None):
+        """
+        Queue `text` for translation
+
+        A request identical to the previous one is ignored unless that one
+        failed, in which case it is retried.
+        """
+        request = (text, source_lang, target_lang, backend)
+        with self.condition:
+            failed = (self.result is not None and self.result["error"] is not None
+                      and self.result["generation"] == self.generation)
+            if request == self.last_request and not failed:
+                return self.generation
+            if (source_lang, target_lang, backend) != (self.last_request or (None,) * 4)[1:]:
+                self.previous = {}
+            self.generation += 1
+            self.last_request = request
+            self.request = (self.generation,) + request
+            self.last_submit = time.monotonic()
+            self.stats["submitted"] += 1
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.condition.notify()
+            return self.generation
+
+    def pending(self):
+        """True while the newest submitted text has no result yet"""
+        with self.condition:
+            if self.generation == 0:
+                return False
+            return self.result is None or self.result["generation"] != self.generation
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if self.request is None and not self.condition.wait_for(
+                        lambda: self.request is not None, self.idle_timeout):
+                    self.thread = None
+                    return
+                while True:
+                    remaining = self.last_submit + self.debounce - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                request, self.request = self.request, None
+            self._translate(*request)
+
+    def _translate(self, generation, text, source_lang, target_lang, backend):
+        segments, layout = segment_document(text)
+        previous = self.previous
+        translations = []
+        reused = 0
+        for segment in segments:
+            if generation != self.generation:
+                self.stats["cancelled"] += 1
+                return
+            key = normalize_text(segment)
+            if key in previous:
+                translations.append(previous[key])
+                reused += 1
+                continue
+            translated, error = translate_text(segment, source_lang, target_lang, self.cache, backend=backend)
+            self.stats["requested"] += 1
+            if error:
+                with self.condition:
+                    if generation == self.generation:
+                        self.result = {"generation": generation, "text": text, "translation": None,
+                                       "error": error}
+                return
+            translations.append(translated)
+        with self.condition:
+            if generation != self.generation:
+                self.stats["cancelled"] += 1
+                return
+            self.previous = {normalize_text(seg): out for seg, out in zip(segments, translations)}
+            self.stats["translated"] += 1
+            self.stats["reused"] += reused
+            self.result = {"generation": generation, "text": text,
+                           "translation": reassemble(layout, translations), "error": None}
+
+
+LIVE_POLL_INTERVAL = 0.3
+
+
+def live_output(worker):
+    """
+    Shows the live worker's latest result
+
+    While a translation is pending this runs as a fragment polling every
+    LIVE_POLL_INTERVAL seconds, so only the output box reruns. When the
+    result arrives it reruns the page once, which renders it without
+    polling; idle sessions do not poll at all.
+    """
+    pending = worker.pending()
+    if not pending and st.session_state.get("live_polling"):
+        st.session_state.live_polling = False
+        st.rerun()
+    result = worker.result
+    if result and result["translation"] is not None:
+        st.session_state.trans_result = result["translation"]
     st.text_area(
         "Translated Text",
         value=st.session_state.trans_result,
@@ -179,52 +1105,418 @@ with col2:
         height=200,
         disabled=True
     )
+    if result and result["error"]:
+        st.error(result["error"])
+    if pending:
+        st.caption("⏳ Translating...")
+    elif result:
+        st.caption("✓ Up to date")
+
+
+# ---------------- HISTORY STORE ---------------- #
+HISTORY_WINDOW = 5
+
 
-    if st.button("🔊 Listen to Translation", use_container_width=True):
-        if st.session_state.trans_result:
-            audio, err = text_to_speech(st.session_state.trans_result, target_lang)
-            if audio:
-                st.audio(audio)
+def fts_query(text):
+    """Turn free text into a safe FTS5 query: every word must match as a prefix"""
+    words = re.findall(r"\w+", text, re.UNICODE)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class HistoryStore:
+    """
+    Persistent, capped translation history with full-text search
+
+    Rows live in SQLite with an FTS5 index over source and translated text
+    (LIKE is used when the SQLite build lacks FTS5). Only the newest
+    `max_rows` entries are kept. Shared by all sessions of the app.
+    """
+
+    def __init__(self, path=None, max_rows=10000):
+        if path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            path = os.path.join(CACHE_DIR, "history.sqlite3")
+        self.max_rows = max_rows
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                created REAL NOT NULL,
+                source_lang TEXT NOT NULL,
+                target_lang TEXT NOT NULL,
+                backend TEXT NOT NULL,
+                source TEXT NOT NULL,
+                translated TEXT NOT NULL
+            );
+        """)
+        indexed = self.db.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'history_fts'").fetchone()
+        try:
+            self.db.executescript("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS history_fts
+                    USING fts5(source, translated, content='history', content_rowid='id');
+                CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN
+                    INSERT INTO history_fts (rowid, source, translated)
+                    VALUES (new.id, new.source, new.translated);
+                END;
+                CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN
+                    INSERT INTO history_fts (history_fts, rowid, source, translated)
+                    VALUES ('delete', old.id, old.source, old.translated);
+                END;
+            """)
+            if not indexed:
+                # Index rows written before the table existed (or by a build without FTS5)
+                self.db.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        self.db.commit()
+
+    def add(self, source_lang, target_lang, source, translated, backend=DEFAULT_BACKEND):
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO history (created, source_lang, target_lang, backend, source, translated) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (time.time(), source_lang, target_lang, backend, source, translated)
+            )
+            self.db.execute(
+                "DELETE FROM history WHERE id <= (SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.max_rows,)
+            )
+            self.db.commit()
+
+    def _where(self, query):
+        """SQL filter for `query`; a blank query matches everything, one with no searchable terms nothing"""
+        if not query or not query.strip():
+            return "", ()
+        if self.fts:
+            match = fts_query(query)
+            if not match:
+                return "WHERE 0", ()
+            return "WHERE id IN (SELECT rowid FROM history_fts WHERE history_fts MATCH ?)", (match,)
+        pattern = "%" + re.sub(r"([\\%_])", r"\\\1", query.strip()) + "%"
+        return "WHERE source LIKE ? ESCAPE '\\' OR translated LIKE ? ESCAPE '\\'", (pattern, pattern)
+
+    def count(self, query=None):
+        where, params = self._where(query)
+        with self.lock:
+            return self.db.execute(f"SELECT COUNT(*) FROM history {where}", params).fetchone()[0]
+
+    def page(self, page=1, per_page=10, query=None):
+        """
+        One page of history, newest first
+
+        Args:
+            page: 1-based page number
+            per_page: Entries per page
+            query: Optional full-text search over source and translated text
+
+        Returns:
+            List of dicts with id, created, source_lang, target_lang,
+            backend, source and translated
+        """
+        where, params = self._where(query)
+        with self.lock:
+            rows = self.db.execute(
+                f"SELECT * FROM history {where} ORDER BY id DESC LIMIT ? OFFSET ?",
+                params + (per_page, (max(page, 1) - 1) * per_page)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM history")
+            self.db.commit()
+
+
+@st.cache_resource
+def get_history_store():
+    return HistoryStore()
+
+
+# ---------------- APP ---------------- #
+def main():
+    # ---------------- PAGE CONFIG ---------------- #
+    st.set_page_config(
+        page_title="PolyGlot Translator",
+        layout="wide",
+        page_icon="🌐"
+    )
+
+    # ---------------- CUSTOM CSS ---------------- #
+    st.markdown("""
+    <style>
+    body {
+        background: linear-gradient(135deg, #0f2027, #203a43, #2c5364);
+    }
+
+    .main {
+        background-color: transparent;
+    }
+
+    h1, h2, h3 {
+        color: #ffffff;
+    }
+
+    p {
+        color: #cccccc;
+    }
+
+    .card {
+        background: rgba(255,255,255,0.05);
+        border-radius: 16px;
+        padding: 20px;
+        box-shadow: 0px 0px 15px rgba(0,0,0,0.4);
+    }
+
+    textarea {
+        background-color: #1e1e1e !important;
+        color: white !important;
+        border-radius: 10px !important;
+    }
+
+    select {
+        background-color: #1e1e1e !important;
+        color: white !important;
+    }
+
+    button {
+        border-radius: 12px !important;
+        font-weight: bold !important;
+    }
+
+    hr {
+        border-color: #444;
+    }
+
+    footer {
+        visibility: hidden;
+    }
+    </style>
+    """, unsafe_allow_html=True)
+
+    # ---------------- SESSION STATE ---------------- #
+    if "trans_result" not in st.session_state:
+        st.session_state.trans_result = ""
+    if "history" not in st.session_state:
+        st.session_state.history = deque(maxlen=HISTORY_WINDOW)
+    if "live_worker" not in st.session_state:
+        st.session_state.live_worker = LiveTranslator()
+
+    # ---------------- HEADER ---------------- #
+    st.markdown("""
+    <h1 style='text-align:center;'>🌐 PolyGlot Translator</h1>
+    <p style='text-align:center;'>Translate and listen in multiple languages</p>
+    <hr>
+    """, unsafe_allow_html=True)
+
+    # ---------------- MAIN LAYOUT ---------------- #
+    backend_names = list(BACKENDS)
+    backend = st.selectbox(
+        "Translation engine",
+        backend_names,
+        index=backend_names.index(DEFAULT_BACKEND) if DEFAULT_BACKEND in backend_names else 0,
+        format_func=lambda name: BACKENDS[name].label,
+        help="Offline engines run locally; speech falls back to gTTS when an engine cannot speak"
+    )
+
+    live = st.toggle(
+        "Live translation",
+        help="Translate as you edit (commit with Ctrl+Enter or by leaving the box); only changed paragraphs are re-translated"
+    )
+
+    chunked_audio = st.toggle(
+        "Stream long audio in parts",
+        value=True,
+        help="Split speech at sentence boundaries and start playing the first part right away"
+    )
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        st.markdown("### 📝 Input")
+
+        source_lang = st.selectbox(
+            "Choose Input language",
+            ["auto"] + list(LANGUAGES.keys()),
+            format_func=lambda x: "Auto Detect" if x == "auto" else LANGUAGES[x]
+        )
+
+        source_text = st.text_area(
+            "Enter Text",
+            placeholder="Type or paste text here...",
+            height=200
+        )
+
+        if st.button("🔊 Listen", use_container_width=True):
+            if source_lang == "auto":
+                st.warning("Select a language for speech.")
             else:
-                st.error(err)
+                play_speech(source_text, source_lang, chunked_audio, backend)
 
-    st.markdown("</div>", unsafe_allow_html=True)
+        st.markdown("</div>", unsafe_allow_html=True)
 
-# ---------------- TRANSLATE BUTTON ---------------- #
-st.markdown("<br>", unsafe_allow_html=True)
+    with col2:
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        st.markdown("### 🌍 Translation")
 
-if st.button("🚀 Translate", type="primary", use_container_width=True):
-    if not source_text.strip():
-        st.warning("Please enter text")
-    else:
-        translated, error = translate_text(source_text, source_lang, target_lang)
-        if translated:
-            st.session_state.trans_result = translated
-            st.session_state.history.append({
-                "time": datetime.now().strftime("%H:%M:%S"),
-                "source_lang": "Auto" if source_lang=="auto" else LANGUAGES[source_lang],
-                "target_lang": LANGUAGES[target_lang],
-                "source": source_text,
-                "translated": translated
-            })
-            st.success("Translation completed")
-            st.rerun()
+        target_lang = st.selectbox(
+            "Choose Translation language",
+            list(LANGUAGES.keys()),
+            format_func=lambda x: LANGUAGES[x]
+        )
+
+        if live:
+            if source_text.strip():
+                st.session_state.live_worker.submit(source_text, source_lang, target_lang, backend)
+            worker = st.session_state.live_worker
+            st.session_state.live_polling = worker.pending()
+            poll = LIVE_POLL_INTERVAL if st.session_state.live_polling else None
+            st.fragment(live_output, run_every=poll)(worker)
         else:
-            st.error(error)
-
-# ---------------- HISTORY ---------------- #
-if st.session_state.history:
-    st.markdown("<div class='card'>", unsafe_allow_html=True)
-    with st.expander("🕘 Recent Translations"):
-        for item in reversed(st.session_state.history[-5:]):
-            st.markdown(f"**{item['source_lang']} → {item['target_lang']}**")
+            st.text_area(
+                "Translated Text",
+                value=st.session_state.trans_result,
+                placeholder="Translation will appear here...",
+                height=200,
+                disabled=True
+            )
+
+        if st.button("🔊 Listen to Translation", use_container_width=True):
+            if st.session_state.trans_result:
+                play_speech(st.session_state.trans_result, target_lang, chunked_audio, backend)
+
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # ---------------- TRANSLATE BUTTON ---------------- #
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    if st.button("🚀 Translate", type="primary", use_container_width=True):
+        if not source_text.strip():
+            st.warning("Please enter text")
+        else:
+            translated, error = translate_text(source_text, source_lang, target_lang, backend=backend)
+            if translated:
+                st.session_state.trans_result = translated
+                st.session_state.history.append({
+                    "time": datetime.now().strftime("%H:%M:%S"),
+                    "source_lang": "Auto" if source_lang=="auto" else LANGUAGES[source_lang],
+                    "target_lang": LANGUAGES[target_lang],
+                    "source": source_text,
+                    "translated": translated
+                })
+                get_history_store().add(source_lang, target_lang, source_text, translated, backend)
+                st.success("Translation completed")
+                st.rerun()
+            else:
+                st.error(error)
+
+    stats = get_translation_cache().stats
+    st.caption(
+        f"⚡ Cache: {stats['memory_hits']} memory hits · "
+        f"{stats['disk_hits']} disk hits · {stats['misses']} misses"
+    )
+
+    # ---------------- BATCH ---------------- #
+    with st.expander("📄 Batch Translate (documents, CSV, JSONL)"):
+        upload = st.file_uploader("Upload a file", type=["txt", "md", "csv", "jsonl"])
+        if upload is not None:
+            kind = os.path.splitext(upload.name)[1].lower().lstrip(".")
+            data = upload.getvalue()
+            columns = None
+            if kind in ("csv", "jsonl"):
+                rows, all_columns = read_table(data, kind)
+                columns = st.multiselect("Columns to translate", all_columns, default=all_columns[:1])
+                st.caption(f"{len(rows)} rows")
+            if st.button("Translate file", use_container_width=True):
+                bar = st.progress(0.0, text="Translating...")
+
+                def report(done, total):
+                    bar.progress(done / total if total else 1.0, text=f"{done}/{total} unique segments")
+
+                batch = BatchTranslator(source_lang, target_lang, backend=backend)
+                if columns is not None:
+                    result = write_table(batch.translate_rows(rows, columns, report), kind)
+                else:
+                    result = batch.translate_document(data.decode("utf-8-sig"), report)
+                if batch.errors:
+                    st.warning(f"{len(batch.errors)} segments could not be translated and were left as-is")
+                root, ext = os.path.splitext(upload.name)
+                st.download_button(
+                    "⬇️ Download translation",
+                    result.encode("utf-8"),
+                    file_name=f"{root}.{target_lang}{ext}",
+                    use_container_width=True
+                )
+
+    # ---------------- MULTI-TARGET ---------------- #
+    with st.expander("🗺️ Translate into many languages"):
+        targets = st.multiselect(
+            "Target languages",
+            list(LANGUAGES.keys()),
+            format_func=lambda x: LANGUAGES[x]
+        )
+        if st.button("Translate into all", use_container_width=True, disabled=not targets):
+            if not source_text.strip():
+                st.warning("Please enter text")
+            else:
+                bar = st.progress(0.0, text=f"0/{len(targets)} languages")
+                translations = {}
+                for lang, translation, errors in fan_out(source_text, source_lang, targets, backend):
+                    translations[lang] = translation
+                    bar.progress(len(translations) / len(targets),
+                                 text=f"{len(translations)}/{len(targets)} languages")
+                    st.markdown(f"**{LANGUAGES[lang]}**" + (" ⚠️ partly untranslated" if errors else ""))
+                    st.text(translation)
+                st.download_button(
+                    "⬇️ Download all (zip)",
+                    make_bundle(source_text, translations),
+                    file_name="translations.zip",
+                    mime="application/zip",
+                    use_container_width=True
+                )
+
+    # ---------------- HISTORY ---------------- #
+    if st.session_state.history:
+        st.markdown("<div class='card'>", unsafe_allow_html=True)
+        with st.expander("🕘 Recent Translations"):
+            for item in reversed(st.session_state.history):
+                st.markdown(f"**{item['source_lang']} → {item['target_lang']}**")
+                st.markdown(f"Input: {item['source']}")
+                st.markdown(f"Output: {item['translated']}")
+                st.markdown("---")
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # ---------------- SEARCH HISTORY ---------------- #
+    with st.expander("🔎 Search all translations"):
+        store = get_history_store()
+        query = st.text_input("Search source or translated text", placeholder="e.g. good morning")
+        per_page = 10
+        total = store.count(query)
+        pages = max(1, (total + per_page - 1) // per_page)
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+        st.caption(f"{total} translations · page {page} of {pages}")
+        for item in store.page(page, per_page, query):
+            source_name = "Auto" if item["source_lang"] == "auto" else LANGUAGES.get(item["source_lang"], item["source_lang"])
+            target_name = LANGUAGES.get(item["target_lang"], item["target_lang"])
+            when = datetime.fromtimestamp(item["created"]).strftime("%Y-%m-%d %H:%M")
+            st.markdown(f"**{source_name} → {target_name}** · {when}")
             st.markdown(f"Input: {item['source']}")
             st.markdown(f"Output: {item['translated']}")
+            if st.button("Reuse this translation", key=f"reuse_{item['id']}"):
+                st.session_state.trans_result = item["translated"]
+                st.rerun()
             st.markdown("---")
-    st.markdown("</div>", unsafe_allow_html=True)
 
-# ---------------- FOOTER ---------------- #
-st.markdown("""
-<hr>
-<p style='text-align:center;color:#aaa;'>PolyGlot Translator © 2026 | Professional UI Edition</p>
-""", unsafe_allow_html=True)
\ No newline at end of file
+    # ---------------- FOOTER ---------------- #
+    st.markdown("""
+    <hr>
+    <p style='text-align:center;color:#aaa;'>PolyGlot Translator © 2026 | Professional UI Edition</p>
+    """, unsafe_allow_html=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Tests for the PolyGlot translation cache, batching, rate limiting, history and live mode
+Run: python -m pytest Translating_tool
+
+Translations come from a local stub, so no network access is needed.
+"""
+
+import pytest
+
+import polyglot_pro
+from polyglot_pro import TranslationCache, translate_text
+
+
+class StubTranslator:
+    """Stands in for GoogleTranslator and counts the upstream calls"""
+    calls = []
+
+    def __init__(self, source, target):
+        self.source = source
+        self.target = target
+
+    def translate(self, text):
+        StubTranslator.calls.append((self.source, self.target, text))
+        return f"[{self.target}] {text.strip()}"
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def reset_stub():
+    StubTranslator.calls = []
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(polyglot_pro.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "translations.sqlite3")
+
+
+def translate(text, cache, source="en", target="fr"):
+    return translate_text(text, source, target, cache=cache, translator_factory=StubTranslator)
+
+
+def test_memory_hit_after_miss(cache_path):
+    cache = TranslationCache(cache_path)
+    assert translate("Hello", cache) == ("[fr] Hello", None)
+    assert translate("Hello", cache) == ("[fr] Hello", None)
+    assert cache.stats == {"memory_hits": 1, "disk_hits": 0, "misses": 1}
+    assert len(StubTranslator.calls) == 1
+
+
+def test_disk_hit_in_fresh_instance(cache_path):
+    translate("Good morning", TranslationCache(cache_path))
+    fresh = TranslationCache(cache_path)
+    assert translate("Good morning", fresh) == ("[fr] Good morning", None)
+    assert fresh.stats == {"memory_hits": 0, "disk_hits": 1, "misses": 0}
+    assert len(StubTranslator.calls) == 1
+
+
+def test_normalized_variants_share_one_key(cache_path):
+    cache = TranslationCache(cache_path)
+    # NFC vs. NFD "é", extra spaces, CRLF line endings and surrounding blanks
+    variants = ["Café  au lait\r\nplease", "  Café au   lait\nplease ", "Café au lait\nplease"]
+    assert len({TranslationCache.key(text, "en", "fr") for text in variants}) == 1
+    results = {translate(text, cache)[0] for text in variants}
+    assert len(results) == 1
+    assert len(StubTranslator.calls) == 1
+    # The language pair is part of the key
+    assert TranslationCache.key(variants[0], "en", "de") != TranslationCache.key(variants[0], "en", "fr")
+
+
+def test_entries_expire_after_ttl(cache_path, clock):
+    cache = TranslationCache(cache_path, ttl=60)
+    translate("Thank you", cache)
+    clock.now += 59
+    translate("Thank you", cache)
+    assert len(StubTranslator.calls) == 1
+
+    clock.now += 2
+    assert cache.get("Thank you", "en", "fr") is None
+    assert TranslationCache(cache_path, ttl=60).get("Thank you", "en", "fr") is None
+    translate("Thank you", cache)
+    assert len(StubTranslator.calls) == 2
+
+
+def test_max_rows_trims_least_recently_used(cache_path, clock):
+    # No memory level, so every hit refreshes last_used on disk
+    cache = TranslationCache(cache_path, memory_size=0, max_rows=3)
+    for text in ("one", "two", "three"):
+        clock.now += 1
+        translate(text, cache)
+    clock.now += 1
+    translate("one", cache)  # "two" is now the least recently used
+    clock.now += 1
+    translate("four", cache)
+
+    rows = {row[0] for row in cache.db.execute("SELECT translation FROM translations")}
+    assert rows == {"[fr] one", "[fr] three", "[fr] four"}
+    assert cache.get("two", "en", "fr") is None
+    assert len(StubTranslator.calls) == 4
+
+
+def test_memory_level_is_bounded(cache_path):
+    cache = TranslationCache(cache_path, memory_size=2)
+    for text in ("a", "b", "c"):
+        translate(text, cache)
+    assert len(cache.memory) == 2
+    translate("a", cache)
+    assert cache.stats["disk_hits"] == 1
+
+
+def test_stub_called_once_per_distinct_text(cache_path):
+    cache = TranslationCache(cache_path)
+    for _ in range(5):
+        translate("Where is the station?", cache)
+        translate("Where is the station?", cache, target="de")
+    assert StubTranslator.calls == [("en", "fr", "Where is the station?"),
+                                    ("en", "de", "Where is the station?")]
+
+
+def test_failed_translation_is_not_cached(cache_path):
+    class Failing(StubTranslator):
+        def translate(self, text):
+            raise ConnectionError("offline")
+
+    cache = TranslationCache(cache_path)
+    translated, error = translate_text("Hello", "en", "fr", cache=cache, translator_factory=Failing)
+    assert translated is None and error == "offline"
+    assert cache.get("Hello", "en", "fr") is None
+
+
+@pytest.mark.parametrize("text", [
+    "Line one is here.\nLine two is here.\n" * 200,
+    "Intro.\n\n" + "A sentence without an end " * 60 + "\n\n  tail  ",
+    "Windows lines.\r\nNext one!\r\n" * 150,
+])
+def test_segment_document_round_trips(text):
+    segments, layout = polyglot_pro.segment_document(text, limit=500)
+    assert polyglot_pro.reassemble(layout, segments) == text
+    assert all(0 < len(segment) <= 500 and segment == segment.strip() for segment in segments)
+
+
+def test_translate_file_requires_columns_for_tables(tmp_path):
+    path = tmp_path / "rows.csv"
+    path.write_text("id,text\n1,Hello\n2,Hello\n")
+    with pytest.raises(ValueError):
+        polyglot_pro.translate_file(str(path), "en", "fr", translator_factory=StubTranslator)
+
+    cache = TranslationCache(str(tmp_path / "translations.sqlite3"))
+    output, errors = polyglot_pro.translate_file(str(path), "en", "fr", columns=["text"], cache=cache,
+                                                 translator_factory=StubTranslator)
+    assert errors == []
+    assert open(output).read().splitlines() == ["id,text,text_fr", "1,Hello,[fr] Hello", "2,Hello,[fr] Hello"]
+    assert len(StubTranslator.calls) == 1
+
+
+def test_host_limiter_is_shared_and_only_explicit_rates_change_it():
+    limiter = polyglot_pro.host_limiter("limiter-test.example")
+    assert limiter.rate == polyglot_pro.DEFAULT_RATE_LIMIT
+    polyglot_pro.set_host_rate("limiter-test.example", 20.0)
+    assert polyglot_pro.host_limiter("limiter-test.example") is limiter
+    assert limiter.interval == pytest.approx(0.05)
+
+    backend = polyglot_pro.TranslationBackend()
+    backend.host = "limiter-test.example"
+    batch = polyglot_pro.BatchTranslator("en", "fr", cache=object(), backend=backend, rate_limit=10.0)
+    assert batch.limiter is limiter and limiter.interval == pytest.approx(0.1)
+    # Calls with the default rate (UI clicks, live mode) keep the host's rate
+    polyglot_pro.BatchTranslator("en", "fr", cache=object(), backend=backend)
+    assert limiter.interval == pytest.approx(0.1)
+    # A stub never reaches the backend's host, so it is not throttled
+    stubbed = polyglot_pro.BatchTranslator("en", "fr", cache=object(), backend=backend,
+                                           translator_factory=StubTranslator)
+    assert stubbed.limiter is not limiter
+
+
+def test_history_search_without_terms_matches_nothing(tmp_path):
+    history = polyglot_pro.HistoryStore(str(tmp_path / "history.sqlite3"))
+    history.add("en", "fr", "Hello there", "Bonjour")
+    history.add("en", "fr", "Good night", "Bonne nuit")
+    assert history.count() == history.count("  ") == 2
+    assert [row["source"] for row in history.page(query="night")] == ["Good night"]
+    for query in ("?", '"', "*"):
+        assert history.count(query) == 0 and history.page(query=query) == []
+
+
+def test_history_index_is_built_for_existing_rows(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    db = polyglot_pro.sqlite3.connect(path)
+    db.execute("CREATE TABLE history (id INTEGER PRIMARY KEY AUTOINCREMENT, created REAL NOT NULL, "
+               "source_lang TEXT NOT NULL, target_lang TEXT NOT NULL, backend TEXT NOT NULL, "
+               "source TEXT NOT NULL, translated TEXT NOT NULL)")
+    db.execute("INSERT INTO history (created, source_lang, target_lang, backend, source, translated) "
+               "VALUES (0, 'en', 'de', 'google', 'Thank you', 'Danke')")
+    db.commit()
+    db.close()
+
+    history = polyglot_pro.HistoryStore(path)
+    if not history.fts:
+        pytest.skip("SQLite build without FTS5")
+    assert history.count("danke") == 1
+    history.add("en", "de", "Thank you very much", "Vielen Dank")
+    assert polyglot_pro.HistoryStore(path).count("thank") == 2
+
+
+class StubBackend(polyglot_pro.TranslationBackend):
+    """Backend without a host (so no rate limit) whose translator is a stub"""
+    name = "stub"
+    cache_namespace = "stub"
+
+    def __init__(self, translator=StubTranslator):
+        self.translator = translator
+
+
+def wait_until_done(worker, timeout=5.0):
+    deadline = polyglot_pro.time.monotonic() + timeout
+    while worker.pending():
+        assert polyglot_pro.time.monotonic() < deadline, "live translation did not finish"
+        polyglot_pro.time.sleep(0.01)
+    return worker.result
+
+
+def test_live_coalesces_edits_and_reuses_paragraphs(cache_path):
+    worker = polyglot_pro.LiveTranslator(debounce=0.1, cache=TranslationCache(cache_path))
+    backend = StubBackend()
+    assert not worker.pending()
+    for text in ("H", "He", "Hello", "Hello.\n\nGood"):
+        worker.submit(text, "en", "fr", backend)
+    assert wait_until_done(worker)["translation"] == "[fr] Hello.\n\n[fr] Good"
+    assert [call[2] for call in StubTranslator.calls] == ["Hello.", "Good"]
+
+    # Only the edited paragraph goes upstream; an identical resubmit does nothing
+    worker.submit("Hello.\n\nGood night", "en", "fr", backend)
+    assert wait_until_done(worker)["translation"] == "[fr] Hello.\n\n[fr] Good night"
+    worker.submit("Hello.\n\nGood night", "en", "fr", backend)
+    assert not worker.pending()
+    assert [call[2] for call in StubTranslator.calls] == ["Hello.", "Good", "Good night"]
+    assert worker.stats["submitted"] == 5 and worker.stats["translated"] == 2
+
+
+def test_live_superseded_request_is_cancelled(cache_path):
+    started = polyglot_pro.threading.Event()
+    release = polyglot_pro.threading.Event()
+
+    class Blocking(StubTranslator):
+        def translate(self, text):
+            if text == "First.":
+                started.set()
+                release.wait(5)
+            return super().translate(text)
+
+    worker = polyglot_pro.LiveTranslator(debounce=0.01, cache=TranslationCache(cache_path))
+    backend = StubBackend(Blocking)
+    worker.submit("First.\n\nSecond.\n\nThird.", "en", "fr", backend)
+    assert started.wait(5)
+    worker.submit("Other.", "en", "fr", backend)
+    release.set()
+    assert wait_until_done(worker)["translation"] == "[fr] Other."
+    # The old request stopped after its running paragraph
+    assert [call[2] for call in StubTranslator.calls] == ["First.", "Other."]
+    assert worker.stats["cancelled"] == 1
+
+
+def test_live_retries_same_text_after_error(cache_path):
+    class FailsOnce(StubTranslator):
+        failures = 1
+
+        def translate(self, text):
+            if FailsOnce.failures:
+                FailsOnce.failures -= 1
+                raise ConnectionError("offline")
+            return super().translate(text)
+
+    worker = polyglot_pro.LiveTranslator(debounce=0.01, cache=TranslationCache(cache_path))
+    backend = StubBackend(FailsOnce)
+    worker.submit("Hello", "en", "fr", backend)
+    assert wait_until_done(worker)["error"] == "offline"
+    worker.submit("Hello", "en", "fr", backend)
+    assert worker.pending()
+    result = wait_until_done(worker)
+    assert result["translation"] == "[fr] Hello" and result["error"] is None
+
+
+def test_row_count_tracks_replaces_expiry_and_clear(cache_path, clock):
+    cache = TranslationCache(cache_path, memory_size=0, ttl=60)
+
+    def rows():
+        return cache.db.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    cache.put("one", "en", "fr", "un")
+    cache.put("one", "en", "fr", "un!")  # replaces the row
+    cache.put("two", "en", "fr", "deux")
+    assert cache.rows == rows() == 2
+    clock.now += 61
+    cache.put("three", "en", "fr", "trois")  # the first two have expired
+    assert cache.rows == rows() == 1
+    assert TranslationCache(cache_path).rows == 1
+    cache.clear()
+    assert cache.rows == rows() == 0
+
+
+@pytest.mark.parametrize("stem, pair", [
+    ("en-fr", ("en", "fr")),
+    ("zh-CN-en", ("zh-CN", "en")),
+    ("en-zh-tw", ("en", "zh-TW")),
+    ("xx-yy", ("xx", "yy")),
+    ("a-b-c", None),
+    ("enfr", None),
+])
+def test_phrasebook_file_names(stem, pair):
+    assert polyglot_pro.language_pair(stem) == pair
+
+
+def test_phrasebook_loads_hyphenated_codes(tmp_path):
+    (tmp_path / "zh-CN-en.tsv").write_text("你好\tHello\n", encoding="utf-8")
+    backend = polyglot_pro.PhrasebookBackend(str(tmp_path))
+    assert backend.translator(source="zh-CN", target="en").translate("你好") == "Hello"
+    assert backend.translator(source="en", target="zh-CN").translate("Hello") == "你好"
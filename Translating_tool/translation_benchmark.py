@@ -0,0 +1,180 @@
+"""
+Benchmarks for PolyGlot translation backends
+Run: python translation_benchmark.py [backends|fanout] --help
+
+- backends: latency and throughput of every engine on the same sample texts
+- fanout:   one text into many languages, sequential vs. concurrent fan-out
+
+Calls go straight to each backend's translator (the translation cache is
+bypassed), so the numbers reflect the engine itself. Online engines need
+internet access; failed calls are counted, not fatal.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+from polyglot_pro import (BACKENDS, LANGUAGES, TranslationBackend, TranslationCache, fan_out,
+                          get_backend, reassemble, segment_document, translate_text)
+
+SAMPLE_TEXTS = [
+    "Hello",
+    "Good morning, how are you?",
+    "Thank you, my friend. Where is the bathroom?",
+    "Good night and goodbye. " * 10,
+    "Please bring water. I love you. Yes or no? " * 25,
+]
+
+
+def print_result(name, latencies, chars, errors):
+    latencies = np.asarray(latencies) * 1000
+    total = latencies.sum() / 1000 if len(latencies) else 0.0
+    p50, p95 = np.percentile(latencies, [50, 95]) if len(latencies) else (0.0, 0.0)
+    print(f"{name}")
+    print(f"  {len(latencies) / total if total else 0:9.1f} req/s | {chars / total if total else 0:11.0f} chars/s | "
+          f"latency p50 {p50:.2f} ms, p95 {p95:.2f} ms | errors {errors}")
+
+
+def bench_backends(names=None, pairs=(("en", "es"), ("en", "fr")), samples=SAMPLE_TEXTS, repeat=3):
+    """
+    Translate the same samples with every backend and compare
+
+    Args:
+        names: Backend names (default: all registered backends)
+        pairs: (source, target) language pairs to exercise
+        samples: Texts to translate
+        repeat: How many passes over the samples per pair
+
+    Returns:
+        Dict of backend name -> {"latencies", "chars", "errors"}
+    """
+    results = {}
+    for name in names or BACKENDS:
+        start = time.perf_counter()
+        backend = get_backend(name)  # loading happens once here, outside the per-call timings
+        load = time.perf_counter() - start
+        latencies = []
+        chars = 0
+        errors = 0
+        for source, target in pairs:
+            translator = backend.translator(source=source, target=target)
+            for _ in range(repeat):
+                for text in samples:
+                    start = time.perf_counter()
+                    try:
+                        translator.translate(text)
+                    except Exception:
+                        errors += 1
+                        continue
+                    latencies.append(time.perf_counter() - start)
+                    chars += len(text)
+        print_result(f"{name} ({BACKENDS[name].label}, load {load * 1000:.1f} ms)", latencies, chars, errors)
+        results[name] = {"latencies": latencies, "chars": chars, "errors": errors}
+    return results
+
+
+class SimulatedLatencyBackend(TranslationBackend):
+    """
+    Wraps a backend and adds a fixed per-request delay to mimic a remote API
+
+    Pairs the inner backend cannot handle echo the input, so any target
+    language can be benchmarked offline.
+    """
+
+    def __init__(self, inner, latency):
+        self.inner = inner
+        self.latency = latency
+        self.name = f"{inner.name}+{latency * 1000:.0f}ms"
+        self.host = f"simulated-{id(self)}"
+        self.cache_namespace = self.name
+
+    def translator(self, source, target):
+        inner = self.inner.translator(source=source, target=target)
+        latency = self.latency
+
+        class Delayed:
+            def translate(self, text):
+                time.sleep(latency)
+                try:
+                    return inner.translate(text)
+                except ValueError:
+                    return text
+
+        return Delayed()
+
+
+def bench_fanout(backend, targets, text, workers=6, segment_workers=2, rate_limit=50.0):
+    """
+    Wall time of translating `text` into every target: sequential vs. fan_out
+
+    Each mode gets a fresh, empty translation cache so neither benefits
+    from the other's results.
+    """
+    segments, layout = segment_document(text)
+    print(f"{len(segments)} segments x {len(targets)} languages via {backend.name}")
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = TranslationCache(os.path.join(tmp, "sequential.sqlite3"))
+        start = time.perf_counter()
+        for target in targets:
+            parts = [translate_text(segment, "auto", target, cache, backend=backend, rate_limit=rate_limit)[0]
+                     or segment
+                     for segment in segments]
+            reassemble(layout, parts)
+        sequential = time.perf_counter() - start
+
+        cache = TranslationCache(os.path.join(tmp, "fanout.sqlite3"))
+        start = time.perf_counter()
+        first = None
+        errors = 0
+        for _, _, failed in fan_out(text, "auto", targets, backend, workers=workers,
+                                    segment_workers=segment_workers, rate_limit=rate_limit, cache=cache):
+            first = first or time.perf_counter() - start
+            errors += len(failed)
+        concurrent = time.perf_counter() - start
+
+    print(f"  sequential {sequential:8.2f} s")
+    print(f"  fan-out    {concurrent:8.2f} s (first language after {first:.2f} s) | "
+          f"speed-up {sequential / concurrent:.1f}x | failed segments {errors}")
+    return {"sequential": sequential, "fan_out": concurrent, "first": first}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PolyGlot translation benchmarks")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    backends = commands.add_parser('backends', help="Latency/throughput across translation backends")
+    backends.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=None)
+    backends.add_argument('--pairs', nargs='+', default=['en-es', 'en-fr'],
+                          help="Language pairs as source-target")
+    backends.add_argument('--repeat', type=int, default=3)
+
+    fanout = commands.add_parser('fanout', help="Sequential vs. concurrent multi-language translation")
+    fanout.add_argument('--backend', choices=list(BACKENDS), default='phrasebook')
+    fanout.add_argument('--targets', nargs='+',
+                        default=['es', 'fr', 'de', 'it', 'pt', 'nl', 'sv', 'pl', 'tr', 'ja', 'ko', 'zh-CN'])
+    fanout.add_argument('--latency-ms', type=float, default=150,
+                        help="Simulated per-request latency added to the backend (0 = none)")
+    fanout.add_argument('--paragraphs', type=int, default=5)
+    fanout.add_argument('--workers', type=int, default=6)
+    fanout.add_argument('--segment-workers', type=int, default=2)
+    fanout.add_argument('--rate-limit', type=float, default=50.0)
+
+    args = parser.parse_args()
+    if args.command == 'backends':
+        pairs = [tuple(pair.split('-', 1)) for pair in args.pairs]
+        bench_backends(args.backends, pairs, repeat=args.repeat)
+    elif args.command == 'fanout':
+        unknown = [t for t in args.targets if t not in LANGUAGES]
+        if unknown:
+            parser.error(f"unknown languages: {' '.join(unknown)}")
+        backend = get_backend(args.backend)
+        if args.latency_ms:
+            backend = SimulatedLatencyBackend(backend, args.latency_ms / 1000)
+        text = "\n\n".join(f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} ({i})" for i in range(args.paragraphs))
+        bench_fanout(backend, args.targets, text, args.workers, args.segment_workers, args.rate_limit)
+
+
+if __name__ == "__main__":
+    main()